@@ -0,0 +1,59 @@
+# cache.py
+"""
+[프로세스 내 캐시]
+DB/외부 API 결과처럼 자주 읽고 드물게 바뀌는 데이터를 메모리에 잠시 보관합니다.
+(별도 캐시 서버 없이 라즈베리파이 단일 서버 프로세스 안에서 동작)
+
+- 항목마다 만료 시간(TTL)이 있고, 만료된 항목은 조회 시 버립니다.
+- 최대 개수를 넘으면 가장 오래 사용하지 않은 항목부터 지웁니다. (LRU)
+- 여러 요청 스레드에서 동시에 써도 안전하도록 Lock으로 보호합니다.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """만료 시간(TTL)과 최대 개수(LRU)를 가진 스레드 안전 캐시"""
+
+    def __init__(self, ttl: float, maxsize: int = 128):
+        """
+        Args:
+            ttl (float): 항목 유지 시간 (초)
+            maxsize (int): 최대 보관 개수
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (만료 시각, 값)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """캐시된 값을 반환합니다. (없거나 만료되었으면 default)"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            if item[0] <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value):
+        """값을 저장합니다. (최대 개수를 넘으면 가장 오래된 항목 삭제)"""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """특정 항목을 지웁니다."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """모든 항목을 지웁니다."""
+        with self._lock:
+            self._data.clear()
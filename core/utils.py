@@ -9,44 +9,97 @@ API 서버, 머신러닝 모델, 데이터베이스 간의 연결을 담당하
 3. Database: 제품 조회, 피부 데이터 조회, 추천 결과 저장
 """
 
-import json
 import urllib.request
+import base64
+import hmac
+import io
 import logging
-
-import joblib
+import math
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from contextlib import contextmanager
+from datetime import datetime
+
+import orjson
 import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+import psycopg2.pool
+from psycopg2.extras import RealDictCursor
 import numpy as np
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 
 # 설정 파일 로드 (DB 접속 정보, 모델 경로 등)
 from services.config import *
 
 from services.filters import get_filter_query
+from core.cache import TTLCache
+from services.skin_advisor_logic import ProductMatrix
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# JSON/JSONB 컬럼은 orjson으로 파싱 (모든 연결에 적용)
+psycopg2.extras.register_default_json(loads=orjson.loads, globally=True)
+psycopg2.extras.register_default_jsonb(loads=orjson.loads, globally=True)
+
 
 # ==============================================================================
 # 1. 외부 API 통신 (Weather)
 # ==============================================================================
 
-def get_current_weather(api_key: str = None) -> dict:
+# 날씨 조회 위치 (광주광역시 좌표)
+WEATHER_LAT, WEATHER_LON = 35.15944, 126.85250
+
+# 날씨는 자주 바뀌지 않으므로 10분간 재사용 (좌표별로 보관: "weather:{lat}:{lon}")
+WEATHER_CACHE_TTL = 600  # 초
+_WEATHER_CACHE = TTLCache(WEATHER_CACHE_TTL, maxsize=8)
+
+# 두 날씨 API를 동시에 호출하기 위한 작업 스레드
+# (응답이 늦은 이전 호출이 스레드를 잡고 있어도 다음 호출이 밀리지 않도록 여유 있게)
+WEATHER_API_TIMEOUT = 3  # 초
+_WEATHER_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="weather")
+
+
+def get_current_weather(api_key: str = None, lat: float = WEATHER_LAT, lon: float = WEATHER_LON) -> dict:
     """
-    날씨 정보를 가져옵니다. (이중화 로직 적용)
+    날씨 정보를 가져옵니다. (이중화 로직 적용, 1·2순위는 동시에 호출)
     1순위: OpenWeatherMap (API Key 필요, 정확도 높음)
     2순위: Open-Meteo (API Key 불필요, 백업용)
     3순위: 기본값 (모두 실패 시)
 
+    조회 결과는 WEATHER_CACHE_TTL 동안 캐시하여, 그 사이 요청은 외부 API를 호출하지 않습니다.
+    (기본값으로 대체된 경우는 캐시하지 않고 다음 요청에서 다시 시도)
+
     Args:
         api_key (str): OWM API Key
+        lat (float), lon (float): 조회 좌표 (기본값: 광주광역시)
 
     Returns:
         dict: {'uv': float, 'humidity': int, 'temperature': float, 'source': str}
     """
-    # 위치 설정 (광주광역시 좌표)
-    lat, lon = 35.15944, 126.85250
+    cache_key = f"weather:{lat}:{lon}"
+    cached = _WEATHER_CACHE.get(cache_key)
+    if cached is not None:
+        return dict(cached)
+
+    env = _fetch_current_weather(api_key, lat, lon)
+    if env["source"] != "fallback":
+        _WEATHER_CACHE.set(cache_key, env)
+    return dict(env)
+
 
+def _fetch_current_weather(api_key: str, lat: float, lon: float) -> dict:
+    """
+    [내부 함수] 외부 날씨 API를 실제로 호출합니다. (get_current_weather 참고)
+    OpenWeatherMap과 Open-Meteo를 동시에 호출하고, 먼저 정상 응답한 쪽을 사용합니다.
+    (동시에 응답한 경우에는 우선순위가 높은 OpenWeatherMap 결과를 사용)
+    """
     # 3순위: 최후의 보루 (기본값)
     fallback_env = {
         "uv": 5.0,
@@ -55,121 +108,231 @@ def get_current_weather(api_key: str = None) -> dict:
         "source": "fallback"
     }
 
-    # ---------------------------------------------------------
-    # 1순위: OpenWeatherMap
-    # ---------------------------------------------------------
+    # 우선순위 순서 (1순위 OWM은 API Key가 있을 때만)
+    futures = []
     if api_key:
-        try:
-            url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&units=metric&appid={api_key}"
-            with urllib.request.urlopen(url, timeout=3) as res:
-                data = json.load(res)
-
-                # OWM은 무료 버전에서 UV를 제공하지 않는 경우가 많아 기본값 5.0 사용
-                return {
-                    "temperature": float(data["main"]["temp"]),
-                    "humidity": int(data["main"]["humidity"]),
-                    "uv": 5.0,
-                    "source": "api(OpenWeatherMap)"
-                }
-        except Exception as e:
-            logger.warning(f"⚠️ OpenWeatherMap 호출 실패 ({e}), 백업 API를 시도합니다.")
+        futures.append(_WEATHER_EXECUTOR.submit(_fetch_openweathermap, lat, lon, api_key))
+    futures.append(_WEATHER_EXECUTOR.submit(_fetch_open_meteo, lat, lon))
 
-    # ---------------------------------------------------------
-    # 2순위: Open-Meteo
-    # ---------------------------------------------------------
     try:
-        # Open-Meteo는 키가 필요 없고 UV, 습도, 기온을 한 번에 줍니다.
+        for _ in as_completed(futures, timeout=WEATHER_API_TIMEOUT):
+            # 이미 끝난 것 중 성공한 결과를 우선순위 순서로 선택
+            for future in futures:
+                if future.done() and future.exception() is None:
+                    return future.result()
+    except FuturesTimeout:
+        logger.error("❌ 날씨 API 응답 시간 초과, 기본값을 사용합니다.")
+    else:
+        logger.error("❌ 모든 날씨 API 호출 실패, 기본값을 사용합니다.")
+
+    # 모든 API 실패 시 기본값 반환
+    return fallback_env
+
+
+def _fetch_openweathermap(lat: float, lon: float, api_key: str) -> dict:
+    """[내부 함수] 1순위: OpenWeatherMap"""
+    try:
+        url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&units=metric&appid={api_key}"
+        with urllib.request.urlopen(url, timeout=WEATHER_API_TIMEOUT) as res:
+            data = orjson.loads(res.read())
+
+        # OWM은 무료 버전에서 UV를 제공하지 않는 경우가 많아 기본값 5.0 사용
+        return {
+            "temperature": float(data["main"]["temp"]),
+            "humidity": int(data["main"]["humidity"]),
+            "uv": 5.0,
+            "source": "api(OpenWeatherMap)"
+        }
+    except Exception as e:
+        logger.warning(f"⚠️ OpenWeatherMap 호출 실패 ({e})")
+        raise
+
+
+def _fetch_open_meteo(lat: float, lon: float) -> dict:
+    """[내부 함수] 2순위: Open-Meteo (키가 필요 없고 UV, 습도, 기온을 한 번에 줍니다.)"""
+    try:
         url = (
             f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}"
             f"&current=temperature_2m,relative_humidity_2m,uv_index"
         )
 
-        with urllib.request.urlopen(url, timeout=3) as res:
-            data = json.load(res)
-            current = data.get("current", {})
-
-            return {
-                "temperature": float(current.get("temperature_2m", 24.0)),
-                "humidity": int(current.get("relative_humidity_2m", 45)),
-                "uv": float(current.get("uv_index", 5.0)),
-                "source": "api(Open-Meteo)"
-            }
+        with urllib.request.urlopen(url, timeout=WEATHER_API_TIMEOUT) as res:
+            data = orjson.loads(res.read())
+        current = data.get("current", {})
 
+        return {
+            "temperature": float(current.get("temperature_2m", 24.0)),
+            "humidity": int(current.get("relative_humidity_2m", 45)),
+            "uv": float(current.get("uv_index", 5.0)),
+            "source": "api(Open-Meteo)"
+        }
     except Exception as e:
-        logger.error(f"❌ Open-Meteo 호출 실패 ({e}), 기본값을 사용합니다.")
-
-    # 모든 API 실패 시 기본값 반환
-    return fallback_env
+        logger.warning(f"⚠️ Open-Meteo 호출 실패 ({e})")
+        raise
 
 # ==============================================================================
 # 2. 머신러닝 (Machine Learning)
 # ==============================================================================
 
+# 학습된 모델은 프로세스에 한 번만 로드해 재사용 (파일이 갱신되면 수정 시각을 보고 다시 로드)
+_MODEL = None
+_MODEL_MTIME = None
+_MODEL_LOCK = threading.Lock()
+
+# 모델 파일 존재 여부는 import 시 한 번만 확인 (재학습으로 파일이 생기면 train_model_from_db에서 갱신)
+_MODEL_AVAILABLE = os.path.exists(MODEL_PATH)
+
+# 파일 교체 확인(stat)은 매 요청이 아니라 이 간격마다 한 번만 수행
+MODEL_RELOAD_CHECK_INTERVAL = 5.0  # 초
+_MODEL_NEXT_CHECK = 0.0
+
+# sklearn은 무거우므로 처음 필요할 때 한 번만 import 해서 보관
+_SKLEARN = None
+
+
+def _lazy_sklearn():
+    """[내부 함수] (LogisticRegression, Pipeline, StandardScaler) 클래스를 반환합니다."""
+    global _SKLEARN
+    if _SKLEARN is None:
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import Pipeline
+        from sklearn.preprocessing import StandardScaler
+        _SKLEARN = (LogisticRegression, Pipeline, StandardScaler)
+    return _SKLEARN
+
+
+def _compile_predictor(model):
+    """
+    [내부 함수] 모델에서 '트러블 확률(Class 1)'만 계산하는 전용 함수를 만듭니다.
+    StandardScaler + LogisticRegression 조합이면 평균/표준편차/계수를 한 번만 꺼내 두고
+    sklearn의 입력 검증·메서드 호출 없이 NumPy 연산으로 바로 계산합니다.
+    그 외 모델은 기존처럼 predict_proba를 호출합니다.
+    """
+    LogisticRegression, Pipeline, StandardScaler = _lazy_sklearn()
+
+    steps = [s for _, s in model.steps] if isinstance(model, Pipeline) else [model]
+    scalers, clf = steps[:-1], steps[-1]
+
+    if (isinstance(clf, LogisticRegression) and clf.coef_.shape[0] == 1
+            and all(isinstance(s, StandardScaler) for s in scalers)):
+        coef = clf.coef_[0].astype(np.float64)
+        intercept = float(clf.intercept_[0])
+        # 스케일러 순서대로 (x - mean) / scale 을 평균/배율 벡터로 누적
+        shift = np.zeros_like(coef)
+        scale = np.ones_like(coef)
+        for sc in scalers:
+            mean = sc.mean_ if sc.mean_ is not None else 0.0
+            std = sc.scale_ if sc.scale_ is not None else 1.0
+            shift = (shift - mean) / std
+            scale = scale / std
+
+        # 스케일링을 가중치에 미리 합침: (x * scale + shift) @ coef = x @ weights + bias
+        weights = coef * scale
+        bias = float(shift @ coef) + intercept
+
+        def predict(features):
+            z = float(features[0] @ weights) + bias
+            return 1.0 / (1.0 + math.exp(-z))
+
+        return predict
+
+    def predict(features):
+        return float(model.predict_proba(features)[0, 1])
+
+    return predict
+
+
+def _get_model():
+    """
+    [내부 함수] 캐시된 트러블 예측 함수를 반환합니다. (_compile_predictor 결과)
+    MODEL_PATH 파일이 바뀐 경우(재학습, 수동 교체)에만 joblib.load를 다시 수행합니다.
+    (파일 확인은 MODEL_RELOAD_CHECK_INTERVAL마다 한 번)
+    """
+    global _MODEL, _MODEL_MTIME, _MODEL_NEXT_CHECK
+    now = time.monotonic()
+    if _MODEL is not None and now < _MODEL_NEXT_CHECK:
+        return _MODEL
+
+    _MODEL_NEXT_CHECK = now + MODEL_RELOAD_CHECK_INTERVAL
+    mtime = os.stat(MODEL_PATH).st_mtime
+    if _MODEL is None or mtime != _MODEL_MTIME:
+        with _MODEL_LOCK:
+            if _MODEL is None or mtime != _MODEL_MTIME:
+                import joblib  # 모델을 처음 읽을 때만 필요하므로 서버 시작 시에는 import 하지 않음
+                _MODEL = _compile_predictor(joblib.load(MODEL_PATH))
+                _MODEL_MTIME = mtime
+                logger.info("📦 [ML] 트러블 예측 모델 로드 완료")
+    return _MODEL
+
+
+# 트러블 모델 입력 피처 수 (순서는 _extract_trouble_features / train_model_from_db 참고)
+TROUBLE_FEATURE_COUNT = 12
+
+
+def _extract_trouble_features(payload: dict) -> np.ndarray:
+    """
+    [내부 함수] 요청 데이터에서 트러블 모델 입력 벡터 (1, 12)를 만듭니다.
+    학습 순서: Skin(4) -> Env(3) -> Life(5)
+    중간 리스트 없이 입력 배열에 바로 채움 (요청마다 새 배열이라 스레드 간 공유 없음)
+    """
+    cam_get = payload["camera"].get
+    env_get = payload["env"].get
+    life_get = payload["lifestyle"].get
+
+    features = np.empty((1, TROUBLE_FEATURE_COUNT))
+    f = features[0]
+
+    # (1) 피부 데이터
+    f[0] = cam_get("redness", 0)
+    f[1] = cam_get("sebum", 0)
+    f[2] = cam_get("moisture", 0)
+    f[3] = cam_get("acne", 0)
+
+    # (2) 환경 데이터
+    f[4] = env_get("uv", 0)
+    f[5] = env_get("humidity", 0)
+    f[6] = env_get("temperature", 0)
+
+    # (3) 생활습관 데이터
+    f[7] = life_get("sleep_hours_7d", 7)
+    f[8] = life_get("water_intake_ml", 1500)
+    f[9] = life_get("wash_freq_per_day", 2)
+    f[10] = 1.0 if str(life_get("wash_temp", "")).lower() == "hot" else 0.0
+    f[11] = 1.0 if str(life_get("sensitivity", "")).lower() == "yes" else 0.0
+    return features
+
+
 def predict_trouble_proba(payload: dict) -> dict:
     """
     학습된 모델(.pkl)을 사용하여 피부 트러블 발생 확률을 예측합니다.
     * 팀원 코드(final_skin.py)의 Temperature Scaling(T=1.8) 로직을 이식하여
       과도한 확신(Overconfidence)을 보정했습니다.
     """
-    if not os.path.exists(MODEL_PATH):
+    if not _MODEL_AVAILABLE:
         # 모델이 없을 때는 안전하게 0% 처리
         return {"prob": 0.0, "msg": "AI 모델 파일이 없어 예측을 건너뜁니다."}
 
     try:
-        model = joblib.load(MODEL_PATH)
-
-        # 1. 데이터 추출
-        cam = payload["camera"]
-        env = payload["env"]
-        life = payload["lifestyle"]
-
-        # 2. Feature Vector 생성 (학습 순서: Skin -> Env -> Life)
-
-        # (1) 피부 데이터
-        f_skin = [
-            float(cam.get("redness", 0)),
-            float(cam.get("sebum", 0)),
-            float(cam.get("moisture", 0)),
-            float(cam.get("acne", 0))
-        ]
-
-        # (2) 환경 데이터
-        f_env = [
-            float(env.get("uv", 0)),
-            float(env.get("humidity", 0)),
-            float(env.get("temperature", 0))
-        ]
-
-        # (3) 생활습관 데이터
-        is_hot_wash = 1.0 if str(life.get("wash_temp", "")).lower() == "hot" else 0.0
-        is_sensitive = 1.0 if str(life.get("sensitivity", "")).lower() == "yes" else 0.0
-
-        f_life = [
-            float(life.get("sleep_hours_7d", 7)),
-            float(life.get("water_intake_ml", 1500)),
-            float(life.get("wash_freq_per_day", 2)),
-            is_hot_wash,
-            is_sensitive
-        ]
-
-        # 3. 최종 입력 배열 생성 (2D Array)
-        features = np.array([f_skin + f_env + f_life])
-
-        # 4. 예측 실행 및 보정 (Temperature Scaling)
+        predict = _get_model()
+
+        # 1~2. 데이터 추출 및 Feature Vector 생성
+        features = _extract_trouble_features(payload)
+
+        # 3. 예측 실행 및 보정 (Temperature Scaling)
         # (1) Raw Probability 추출 (Class 1이 트러블 발생일 확률)
-        prob_raw = model.predict_proba(features)[0, 1]
+        prob_raw = predict(features)
 
         # (2) 수치 안정성 처리 (log(0) 방지)
-        prob_safe = np.clip(prob_raw, 1e-4, 1 - 1e-4)
+        # 값 하나짜리 계산이므로 numpy 대신 math로 처리 (numpy 스칼라 생성/호출 비용 제거)
+        prob_safe = min(max(prob_raw, 1e-4), 1 - 1e-4)
 
         # (3) 온도 보정 적용 (T=1.8)
         T = 1.8
-        logit = np.log(prob_safe / (1.0 - prob_safe))
+        logit = math.log(prob_safe / (1.0 - prob_safe))
         logit_T = logit / T
-        final_prob = 1.0 / (1.0 + np.exp(-logit_T))
+        final_prob = 1.0 / (1.0 + math.exp(-logit_T))
 
-        # 5. 결과 메시지 생성
-        final_prob = float(final_prob)  # numpy float -> native float
+        # 4. 결과 메시지 생성
         percent = int(final_prob * 100)
 
         if final_prob < 0.3:
@@ -194,163 +357,285 @@ def predict_trouble_proba(payload: dict) -> dict:
 # 3. 데이터베이스 (PostgreSQL)
 # ==============================================================================
 
+# 요청마다 새로 접속(TCP/인증)하지 않도록 커넥션 풀을 공유 (첫 DB 사용 시 생성)
+DB_POOL_MIN_CONN = 2
+DB_POOL_MAX_CONN = 16
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+# 풀이 비었을 때 psycopg2는 바로 PoolError를 내므로, 빈 커넥션이 생길 때까지 기다리게 함
+# (요청 핸들러가 스레드풀에서 동시에 실행되므로 동시 사용 수를 풀 크기로 제한)
+_POOL_SLOTS = threading.BoundedSemaphore(DB_POOL_MAX_CONN)
+
+
+class _PreparingConnection(psycopg2.extensions.connection):
+    """풀에서 쓰는 커넥션: 이 세션에 PREPARE 해 둔 쿼리 이름을 기억합니다."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+def _get_pool():
+    """[내부 함수] 프로세스 공용 커넥션 풀을 반환합니다. (없으면 생성)"""
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = psycopg2.pool.ThreadedConnectionPool(
+                    DB_POOL_MIN_CONN, DB_POOL_MAX_CONN,
+                    connection_factory=_PreparingConnection, **DB_CONFIG
+                )
+    return _POOL
+
+
+@contextmanager
+def _conn():
+    """
+    [내부 함수] 풀에서 커넥션을 빌려 쓰고 반납합니다.
+    블록이 정상 종료되면 commit, 예외가 나면 rollback 후 예외를 그대로 올립니다.
+    (끊어진 커넥션은 풀에 돌려놓지 않고 닫아서 버림)
+    풀의 커넥션이 모두 사용 중이면 하나가 반납될 때까지 기다립니다.
+    """
+    pool = _get_pool()
+    _POOL_SLOTS.acquire()
+    try:
+        conn = pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn, close=bool(conn.closed))
+    finally:
+        _POOL_SLOTS.release()
+
+
+def _execute_prepared(conn, cursor, name: str, sql: str, params: tuple = ()):
+    """
+    [내부 함수] 자주 쓰는 고정 쿼리를 Prepared Statement로 실행합니다.
+    커넥션(세션)마다 처음 한 번만 PREPARE 하고, 이후에는 EXECUTE만 보내 파싱/플랜 작업을 건너뜁니다.
+
+    Args:
+        name (str): Prepared Statement 이름
+        sql (str): $1, $2 ... 자리표시자를 쓰는 쿼리
+        params (tuple): 자리표시자에 넣을 값
+    """
+    if name not in conn.prepared:
+        cursor.execute(f"PREPARE {name} AS {sql}")
+        conn.prepared.add(name)
+
+    if params:
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cursor.execute(f"EXECUTE {name}")
+
+
+def close_db_pool():
+    """서버 종료 시 풀의 모든 커넥션을 닫습니다."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.closeall()
+            _POOL = None
+
+
 def init_db():
     """
     [DB 초기화 통합 함수]
     서버 시작 시 CSV 파일 구조에 맞춰 모든 테이블을 안전하게 생성합니다.
     """
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-
-        # ---------------------------------------------------------
-        # 1. users (사용자)
-        # ---------------------------------------------------------
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id VARCHAR(50) PRIMARY KEY,
-                password TEXT NOT NULL,
-                name TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-        """)
-
-        # ---------------------------------------------------------
-        # 2. user_profiles (사용자 상세 정보)
-        # ---------------------------------------------------------
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_profiles (
-                user_id VARCHAR(50) PRIMARY KEY,
-                age INTEGER,
-                sleep_hours_7d REAL,
-                water_intake_ml INTEGER,
-                wash_freq_per_day INTEGER,
-                wash_temp TEXT,
-                sensitivity TEXT,
-                pref_texture TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                CONSTRAINT fk_user FOREIGN KEY(user_id) REFERENCES users(user_id) ON DELETE CASCADE
-            );
-        """)
-
-        # ---------------------------------------------------------
-        # 3. products (제품 정보)
-        # ---------------------------------------------------------
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS products (
-                id SERIAL PRIMARY KEY,
-                name TEXT NOT NULL,
-                price INTEGER,
-                brand TEXT,            -- 브랜드 없는 경우 대비 (NULL 허용)
-                official_category TEXT,
-                tags TEXT,
-                featured_ingredients TEXT,
-                url TEXT,
-                image_url TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP -- CSV 호환용 추가
-            );
-        """)
-
-        # ---------------------------------------------------------
-        # 4. analysis_log (피부 분석 기록)
-        # ---------------------------------------------------------
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS analysis_log (
-                id SERIAL PRIMARY KEY,
-                user_id VARCHAR(50),
-                acne INTEGER,
-                wrinkles INTEGER,
-                pores INTEGER,
-                pigmentation INTEGER,
-                redness INTEGER,
-                moisture INTEGER,
-                sebum INTEGER,
-                image_path TEXT,
-                total_score INTEGER,   -- 종합 점수 (NULL 허용)
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-        """)
-
-        # ---------------------------------------------------------
-        # 5. recommendation_log (추천 기록)
-        # ---------------------------------------------------------
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS recommendation_log (
-                id SERIAL PRIMARY KEY,
-                user_id VARCHAR(50),
-                analysis_id INTEGER,
-                skin_age REAL,
-                top3_products TEXT,
-                routine_am TEXT,
-                routine_pm TEXT,
-                trouble_prob REAL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-        """)
-
-        # ---------------------------------------------------------
-        # 6. training_log (AI 학습용 데이터)
-        # ---------------------------------------------------------
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS training_log (
-                id SERIAL PRIMARY KEY,
-                user_id VARCHAR(50),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                redness REAL, sebum REAL, moisture REAL, acne REAL,
-                uv REAL, humidity REAL, temperature REAL,
-                sleep_hours REAL, water_intake INTEGER,
-                wash_freq REAL, is_hot_wash INTEGER, is_sensitive INTEGER
-            );
-        """)
-
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with _conn() as conn, conn.cursor() as cursor:
+            # ---------------------------------------------------------
+            # 1. users (사용자)
+            # ---------------------------------------------------------
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    user_id VARCHAR(50) PRIMARY KEY,
+                    password TEXT NOT NULL,
+                    name TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+            # 로그인 조회(password, name)를 인덱스만으로 처리하기 위한 커버링 인덱스
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_users_covering ON users (user_id) INCLUDE (password, name);
+            """)
+
+            # ---------------------------------------------------------
+            # 2. user_profiles (사용자 상세 정보)
+            # ---------------------------------------------------------
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS user_profiles (
+                    user_id VARCHAR(50) PRIMARY KEY,
+                    age INTEGER,
+                    sleep_hours_7d REAL,
+                    water_intake_ml INTEGER,
+                    wash_freq_per_day INTEGER,
+                    wash_temp TEXT,
+                    sensitivity TEXT,
+                    pref_texture TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    CONSTRAINT fk_user FOREIGN KEY(user_id) REFERENCES users(user_id) ON DELETE CASCADE
+                );
+            """)
+
+            # ---------------------------------------------------------
+            # 3. products (제품 정보)
+            # ---------------------------------------------------------
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS products (
+                    id SERIAL PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    price INTEGER,
+                    brand TEXT,            -- 브랜드 없는 경우 대비 (NULL 허용)
+                    official_category TEXT,
+                    tags JSONB DEFAULT '[]',
+                    featured_ingredients JSONB DEFAULT '[]',
+                    url TEXT,
+                    image_url TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP -- CSV 호환용 추가
+                );
+            """)
+            _migrate_text_to_jsonb(cursor, "products", ("tags", "featured_ingredients"), default="[]")
+            # 태그 포함 검색(tags @> '["..."]')용 GIN 인덱스
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_products_tags ON products USING GIN (tags jsonb_path_ops);
+            """)
+
+            # ---------------------------------------------------------
+            # 4. analysis_log (피부 분석 기록)
+            # ---------------------------------------------------------
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS analysis_log (
+                    id SERIAL PRIMARY KEY,
+                    user_id VARCHAR(50),
+                    acne INTEGER,
+                    wrinkles INTEGER,
+                    pores INTEGER,
+                    pigmentation INTEGER,
+                    redness INTEGER,
+                    moisture INTEGER,
+                    sebum INTEGER,
+                    image_path TEXT,
+                    total_score INTEGER,   -- 종합 점수 (NULL 허용)
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+            # 사용자별 히스토리를 최신순으로 찾아가기 위한 인덱스 (커서 페이지 이동용)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_analysis_user_created
+                    ON analysis_log (user_id, created_at DESC, id DESC);
+            """)
+
+            # ---------------------------------------------------------
+            # 5. recommendation_log (추천 기록)
+            # ---------------------------------------------------------
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS recommendation_log (
+                    id SERIAL PRIMARY KEY,
+                    user_id VARCHAR(50),
+                    analysis_id INTEGER,
+                    skin_age REAL,
+                    top3_products JSONB,
+                    routine_am JSONB,
+                    routine_pm JSONB,
+                    trouble_prob REAL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+            _migrate_text_to_jsonb(cursor, "recommendation_log", ("top3_products", "routine_am", "routine_pm"))
+            # 기간 통계(피부 나이 평균) 조회용 인덱스
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_recommendation_user_created
+                    ON recommendation_log (user_id, created_at);
+            """)
+
+            # ---------------------------------------------------------
+            # 6. training_log (AI 학습용 데이터)
+            # ---------------------------------------------------------
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS training_log (
+                    id SERIAL PRIMARY KEY,
+                    user_id VARCHAR(50),
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    redness REAL, sebum REAL, moisture REAL, acne REAL,
+                    uv REAL, humidity REAL, temperature REAL,
+                    sleep_hours REAL, water_intake INTEGER,
+                    wash_freq REAL, is_hot_wash INTEGER, is_sensitive INTEGER
+                );
+            """)
+
         logger.info("✅ 모든 DB 테이블이 CSV 구조에 맞춰 정상적으로 초기화되었습니다.")
 
     except Exception as e:
         logger.error(f"❌ DB 초기화 중 오류 발생: {e}")
 
+def _migrate_text_to_jsonb(cursor, table: str, columns: tuple, default: str = None):
+    """
+    [내부 함수] 예전 스키마(TEXT에 JSON 문자열 저장)로 만들어진 컬럼을 JSONB로 변환합니다.
+    이미 JSONB인 컬럼은 건너뜁니다. (빈 문자열은 default, default가 없으면 NULL)
+    """
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_name = %s AND column_name = ANY(%s) AND data_type = 'text'
+    """, (table, list(columns)))
+
+    for (col,) in cursor.fetchall():
+        if default is None:
+            cursor.execute(f"""
+                ALTER TABLE {table}
+                    ALTER COLUMN {col} TYPE JSONB USING NULLIF({col}, '')::jsonb;
+            """)
+        else:
+            cursor.execute(f"""
+                ALTER TABLE {table}
+                    ALTER COLUMN {col} DROP DEFAULT,
+                    ALTER COLUMN {col} TYPE JSONB USING COALESCE(NULLIF({col}, ''), %s)::jsonb,
+                    ALTER COLUMN {col} SET DEFAULT %s;
+            """, (default, default))
+        logger.info(f"🔧 [DB] {table}.{col} 컬럼을 JSONB로 변환했습니다.")
+
+
 def load_products_from_db() -> list:
     """
     DB의 'products' 테이블에서 모든 제품 정보를 가져옵니다.
-    (JSON 형태의 태그/성분 데이터를 파이썬 리스트로 변환하여 반환)
+    (태그/성분은 JSONB 컬럼이라 psycopg2가 파이썬 리스트로 바로 변환해 줌)
     """
     products = []
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-
         query = """
             SELECT name, price, brand, official_category, tags, featured_ingredients, url, image_url 
             FROM products
         """
-        cursor.execute(query)
-        rows = cursor.fetchall()
-
-        cursor.close()
-        conn.close()
+        with _conn() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            _execute_prepared(conn, cursor, "load_products", query)
+            rows = cursor.fetchall()
 
         if not rows:
             logger.warning("⚠️ [DB] 제품 데이터가 비어있습니다. data_collector.py를 실행하세요.")
             return []
 
         for row in rows:
-            name, price, brand, category, tags_raw, ings_raw, url, img = row
-
-            # JSON 문자열 -> 파이썬 리스트 변환 (안전장치 포함)
-            tags_list = json.loads(tags_raw) if tags_raw else []
-            ings_list = json.loads(ings_raw) if ings_raw else []
+            tags_list = row["tags"] or []
+            ings_list = row["featured_ingredients"] or []
 
             products.append({
-                "name": name,
-                "price": price,
-                "brand": brand,
-                "official_category": category,
+                "name": row["name"],
+                "price": row["price"],
+                "brand": row["brand"],
+                "official_category": row["official_category"],
                 "tags": tags_list,
                 "featured_ingredients": ings_list,
-                "url": url,
-                "image_url": img
+                "url": row["url"],
+                "image_url": row["image_url"],
+                # 채점 시 매번 set을 만들지 않도록 로드 시점에 한 번만 생성
+                "_tag_set": frozenset(tags_list),
+                "_ing_set": frozenset(ings_list)
             })
 
         logger.info(f"📂 [DB] {len(products)}개의 제품 로드 완료")
@@ -361,67 +646,218 @@ def load_products_from_db() -> list:
         return []
 
 
+# 제품 DB는 데이터 수집 때만 바뀌므로, 채점용 배열(ProductMatrix)로 변환해 프로세스에 보관
+# (다른 프로세스에서 보강 스크립트를 돌린 경우도 반영되도록 5분 뒤 만료)
+PRODUCT_CACHE_TTL = 300  # 초
+_PRODUCT_CACHE = TTLCache(PRODUCT_CACHE_TTL, maxsize=1)
+_PRODUCT_CACHE_LOCK = threading.Lock()
+
+
+def get_cached_product_matrix() -> ProductMatrix:
+    """
+    채점용 제품 배열(ProductMatrix)을 반환합니다.
+    캐시가 비었거나 만료되었을 때만 DB를 조회/변환하고, 그 외에는 캐시를 그대로 사용합니다.
+    (DB가 비어 있거나 조회에 실패하면 캐시하지 않고 다음 요청에서 다시 시도)
+    """
+    pm = _PRODUCT_CACHE.get("products:all")
+    if pm is None:
+        with _PRODUCT_CACHE_LOCK:
+            pm = _PRODUCT_CACHE.get("products:all")
+            if pm is None:
+                products = load_products_from_db()
+                if not products:
+                    return ProductMatrix([])
+                pm = ProductMatrix(products)
+                _PRODUCT_CACHE.set("products:all", pm)
+    return pm
+
+
+def invalidate_product_cache():
+    """제품 데이터 갱신(수집/보강) 후 호출하여 다음 요청에서 새로 로드하도록 합니다."""
+    _PRODUCT_CACHE.clear()
+    logger.info("🔄 [DB] 제품 캐시 초기화")
+
+
+# 분석 기록은 저장 후 바뀌지 않으므로 ID별로 1시간 보관
+ANALYSIS_CACHE_TTL = 3600  # 초
+_ANALYSIS_CACHE = TTLCache(ANALYSIS_CACHE_TTL, maxsize=256)
+
+
 def get_skin_data_by_id(analysis_id: int) -> dict:
     """
     특정 분석 ID(analysis_id)에 해당하는 피부 데이터를 DB에서 조회합니다.
+    (한 번 조회한 기록은 _ANALYSIS_CACHE에서 바로 반환)
     """
-    try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
+    cached = _ANALYSIS_CACHE.get(analysis_id)
+    if cached is not None:
+        return dict(cached)
 
+    try:
         query = """
             SELECT id, acne, wrinkles, pores, pigmentation, redness, moisture, sebum, created_at 
             FROM analysis_log 
-            WHERE id = %s
+            WHERE id = $1
         """
-        cursor.execute(query, (analysis_id,))
-        row = cursor.fetchone()
-
-        cursor.close()
-        conn.close()
+        with _conn() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            _execute_prepared(conn, cursor, "get_analysis", query, (analysis_id,))
+            row = cursor.fetchone()
 
         if not row:
             return None
 
-        row_id, acne, wrinkles, pores, pigmentation, redness, moisture, sebum, created_at = row
-
         # 분석 로직에서 사용하기 편한 Dictionary 형태로 반환
-        return {
-            "id": row_id,
-            "acne": acne,
-            "wrinkle": wrinkles,
-            "pore": pores,
-            "pigmentation": pigmentation,
-            "redness": redness,
-            "sebum": sebum,
-            "moisture": moisture,
+        data = {
+            "id": row["id"],
+            "acne": row["acne"],
+            "wrinkle": row["wrinkles"],
+            "pore": row["pores"],
+            "pigmentation": row["pigmentation"],
+            "redness": row["redness"],
+            "sebum": row["sebum"],
+            "moisture": row["moisture"],
             "tone": 50  # 톤 데이터는 현재 더미값
         }
+        _ANALYSIS_CACHE.set(analysis_id, data)
+        return dict(data)
 
     except Exception as e:
         logger.error(f"⚠️ [DB 연결 오류] {e}")
         return None
 
 
+def _dumps_json(obj) -> str:
+    """
+    orjson으로 JSON 문자열을 만듭니다. (json.dumps보다 빠르고, 한글은 그대로 UTF-8로 유지)
+    NumPy 스칼라/배열도 별도 변환 없이 직렬화됩니다.
+    """
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode("utf-8")
+
+
+class _BatchWriter:
+    """
+    [쓰기 묶음 처리]
+    INSERT할 행을 큐에 모아 두었다가 백그라운드 스레드에서 execute_values로 한 번에 저장합니다.
+    요청 스레드는 큐에 넣고 바로 돌아가므로 DB 왕복을 기다리지 않습니다.
+    (첫 submit 때 스레드 시작, stop() 호출 시 남은 행을 모두 저장하고 종료)
+    """
+    _STOP = object()
+
+    def __init__(self, name: str, insert_sql: str, batch_size: int = 100, interval: float = 0.05):
+        """
+        Args:
+            name (str): 로그에 표시할 이름
+            insert_sql (str): "INSERT INTO ... VALUES %s" 형태의 쿼리
+            batch_size (int): 한 번에 저장할 최대 행 수
+            interval (float): 첫 행이 들어온 뒤 더 모을 최대 시간 (초)
+        """
+        self.name = name
+        self.insert_sql = insert_sql
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, row: tuple):
+        """저장할 행을 큐에 넣습니다."""
+        self.start()
+        self._queue.put(row)
+
+    def start(self):
+        """백그라운드 저장 스레드를 시작합니다. (이미 실행 중이면 무시)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f"db-writer-{self.name}", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """큐에 남은 행을 모두 저장한 뒤 스레드를 종료합니다."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(self._STOP)
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+
+            # 첫 행 이후 interval 동안 batch_size까지 더 모음
+            rows = [item]
+            stop = False
+            deadline = time.monotonic() + self.interval
+            while len(rows) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stop = True
+                    break
+                rows.append(item)
+
+            self._flush(rows)
+            if stop:
+                return
+
+    def _flush(self, rows: list):
+        try:
+            with _conn() as conn, conn.cursor() as cursor:
+                psycopg2.extras.execute_values(cursor, self.insert_sql, rows, page_size=self.batch_size)
+            logger.info(f"✅ [DB] {self.name} {len(rows)}건 저장 완료")
+        except Exception as e:
+            logger.error(f"⚠️ [DB 저장 실패] {self.name} {len(rows)}건: {e}")
+
+
+_REC_INSERT_SQL = """
+    INSERT INTO recommendation_log 
+    (user_id, analysis_id, skin_age, top3_products, routine_am, routine_pm, trouble_prob)
+    VALUES %s
+"""
+_REC_WRITER = _BatchWriter("recommendation_log", _REC_INSERT_SQL)
+
+_TRAINING_COLUMNS = (
+    "user_id", "redness", "sebum", "moisture", "acne", "uv", "humidity", "temperature",
+    "sleep_hours", "water_intake", "wash_freq", "is_hot_wash", "is_sensitive",
+)
+_TRAINING_INSERT_SQL = f"INSERT INTO training_log ({', '.join(_TRAINING_COLUMNS)}) VALUES %s"
+
+# 학습 데이터는 바로 읽을 일이 없으므로 더 크게(최대 500건/2초) 모아서 저장 (save_training_log_db 참고)
+_TRAINING_WRITER = _BatchWriter("training_log", _TRAINING_INSERT_SQL, batch_size=500, interval=2.0)
+
+# 서버 시작/종료 시 함께 관리할 쓰기 스레드 목록
+_DB_WRITERS = (_REC_WRITER, _TRAINING_WRITER)
+
+
+def start_db_writers():
+    """서버 시작 시 백그라운드 DB 쓰기 스레드를 미리 띄웁니다. (첫 요청 지연 방지)"""
+    for writer in _DB_WRITERS:
+        writer.start()
+
+
+def stop_db_writers():
+    """서버 종료 시 큐에 남은 기록을 모두 저장하고 쓰기 스레드를 종료합니다. (close_db_pool보다 먼저 호출)"""
+    for writer in _DB_WRITERS:
+        writer.stop()
+
+
 def save_recommendation_to_db(user_id: str, analysis_id: int, skin_age: float,
-                              rec_result: dict, routine: dict, trouble_prob: float):
+                              rec_result: dict, routine: dict, trouble_prob: float, fsync: bool = False):
     """
     최종 추천 결과(제품, 루틴, 예측확률)를 DB에 저장합니다.
+    기본은 _REC_WRITER 큐에 넣고 바로 반환하며(백그라운드에서 묶어서 저장),
+    fsync=True면 큐를 거치지 않고 즉시 INSERT 후 반환합니다.
     """
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-
         # 복잡한 데이터 구조(List/Dict)는 JSON 문자열로 변환하여 저장
-        products_json = json.dumps(rec_result["top3"], ensure_ascii=False)
-        routine_am_json = json.dumps(routine["am"], ensure_ascii=False)
-        routine_pm_json = json.dumps(routine["pm"], ensure_ascii=False)
-
-        insert_query = """
-            INSERT INTO recommendation_log 
-            (user_id, analysis_id, skin_age, top3_products, routine_am, routine_pm, trouble_prob)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """
+        products_json = _dumps_json(rec_result["top3"])
+        routine_am_json = _dumps_json(routine["am"])
+        routine_pm_json = _dumps_json(routine["pm"])
 
         data = (
             user_id,
@@ -433,11 +869,12 @@ def save_recommendation_to_db(user_id: str, analysis_id: int, skin_age: float,
             trouble_prob
         )
 
-        cursor.execute(insert_query, data)
-        conn.commit()
+        if not fsync:
+            _REC_WRITER.submit(data)
+            return
 
-        cursor.close()
-        conn.close()
+        with _conn() as conn, conn.cursor() as cursor:
+            psycopg2.extras.execute_values(cursor, _REC_INSERT_SQL, [data])
 
         logger.info(f"✅ [DB] 추천 결과 저장 완료 (User: {user_id})")
 
@@ -449,16 +886,20 @@ def save_recommendation_to_db(user_id: str, analysis_id: int, skin_age: float,
 # 4. 사용자 관리 및 기록 조회 (User & History)
 # ==============================================================================
 
+# 프로필은 사용자가 저장할 때만 바뀌므로 잠시 메모리에 보관 (저장 시 즉시 삭제)
+PROFILE_CACHE_TTL = 60  # 초
+_PROFILE_CACHE = TTLCache(PROFILE_CACHE_TTL, maxsize=10000)
+
+# 가입된 아이디 확인 결과 (존재하는 경우만 보관, 탈퇴 기능이 없으므로 TTL로만 만료)
+USER_EXISTS_CACHE_TTL = 300  # 초
+_USER_EXISTS_CACHE = TTLCache(USER_EXISTS_CACHE_TTL, maxsize=10000)
+
 
 def save_user_profile_db(user_id, data: dict):
     """
     사용자 프로필 정보를 user_profiles 테이블에 저장하거나 업데이트합니다.
     """
-    conn = None
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-
         # [수정] user_profiles 테이블 사용
         # 값이 없으면(None) DB에 NULL로 들어가지 않도록 .get('키', 기본값)을 사용
         query = """
@@ -478,28 +919,24 @@ def save_user_profile_db(user_id, data: dict):
         """
 
         # 실제 데이터 바인딩 (기본값 0 또는 '' 설정으로 NULL 방지)
-        cursor.execute(query, (
-            user_id,
-            data.get('age', 25),  # 나이 기본값 25
-            data.get('sleep_hours_7d', 7),  # 수면 기본값 7
-            data.get('water_intake_ml', 1000),  # 물 기본값 1000
-            data.get('wash_freq_per_day', 2),  # 세안 빈도 기본값 2 (여기 값이 자꾸 비었었음)
-            data.get('sensitivity', 'no'),  # 민감성 기본값 no
-            data.get('pref_texture', 'lotion'),  # 제형 기본값 lotion
-            data.get('wash_temp', 'warm')  # 온도 기본값 warm
-        ))
-
-        conn.commit()
+        with _conn() as conn, conn.cursor() as cursor:
+            cursor.execute(query, (
+                user_id,
+                data.get('age', 25),  # 나이 기본값 25
+                data.get('sleep_hours_7d', 7),  # 수면 기본값 7
+                data.get('water_intake_ml', 1000),  # 물 기본값 1000
+                data.get('wash_freq_per_day', 2),  # 세안 빈도 기본값 2 (여기 값이 자꾸 비었었음)
+                data.get('sensitivity', 'no'),  # 민감성 기본값 no
+                data.get('pref_texture', 'lotion'),  # 제형 기본값 lotion
+                data.get('wash_temp', 'warm')  # 온도 기본값 warm
+            ))
+        _PROFILE_CACHE.delete(user_id)
         return True
 
     except Exception as e:
         logger.error(f"❌ 프로필 저장 실패: {e}")
-        if conn: conn.rollback()
         return False
 
-    finally:
-        if conn: conn.close()
-
 
 # ---------------------------------------------------------
 # 2. 프로필 조회
@@ -507,113 +944,154 @@ def save_user_profile_db(user_id, data: dict):
 def get_user_profile_db(user_id):
     """
     user_profiles 테이블에서 정보를 가져옵니다.
+    (PROFILE_CACHE_TTL 동안은 _PROFILE_CACHE에서 바로 반환)
     """
-    conn = None
-    try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
+    cached = _PROFILE_CACHE.get(user_id)
+    if cached is not None:
+        return dict(cached)
 
+    try:
         query = """
             SELECT age, sleep_hours_7d, water_intake_ml, wash_freq_per_day, sensitivity, pref_texture, wash_temp
             FROM user_profiles
-            WHERE user_id = %s
+            WHERE user_id = $1
         """
-        cursor.execute(query, (user_id,))
-        row = cursor.fetchone()
-
-        if row:
-            # DB 컬럼 순서대로 매핑
-            return {
-                "age": row[0],
-                "sleep_hours_7d": row[1],
-                "water_intake_ml": row[2],
-                "wash_freq_per_day": row[3],
-                "sensitivity": row[4],
-                "pref_texture": row[5],
-                "wash_temp": row[6]
-            }
-        return {}  # 데이터가 없으면 빈 딕셔너리 반환 (None 대신)
+        # RealDictCursor: 컬럼 이름을 키로 하는 dict 행을 바로 받음
+        with _conn() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            _execute_prepared(conn, cursor, "get_profile", query, (user_id,))
+            row = cursor.fetchone()
+
+        # 데이터가 없으면 빈 딕셔너리 반환 (None 대신)
+        profile = dict(row) if row else {}
+        _PROFILE_CACHE.set(user_id, profile)
+        return dict(profile)
 
     except Exception as e:
         logger.error(f"❌ 프로필 조회 실패: {e}")
         return {}
 
-    finally:
-        if conn: conn.close()
+
+# 비밀번호는 argon2로 해시해 저장
+_PASSWORD_HASHER = PasswordHasher()
+
+
+def _verify_password(stored: str, password: str) -> bool:
+    """
+    [내부 함수] 저장된 비밀번호(해시)와 입력값을 비교합니다.
+    argon2 해시가 아닌 값은 예전에 평문으로 저장된 계정으로 보고 상수 시간 비교합니다.
+    """
+    if stored.startswith("$argon2"):
+        try:
+            return _PASSWORD_HASHER.verify(stored, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    return hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8"))
 
 
 def register_user_db(user_id, password, name):
-    """회원가입: DB에 사용자 추가"""
+    """회원가입: DB에 사용자 추가 (이미 있는 아이디면 False)"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-
-        # 이미 있는지 확인
-        cursor.execute("SELECT user_id FROM users WHERE user_id = %s", (user_id,))
-        if cursor.fetchone():
-            return False  # 이미 존재함
-
-        cursor.execute("INSERT INTO users (user_id, password, name) VALUES (%s, %s, %s)",
-                       (user_id, password, name))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return True
+        with _conn() as conn, conn.cursor() as cursor:
+            # 존재 확인 + 추가를 한 번의 쿼리로 처리 (이미 있으면 아무것도 반환되지 않음)
+            cursor.execute("""
+                INSERT INTO users (user_id, password, name) VALUES (%s, %s, %s)
+                ON CONFLICT (user_id) DO NOTHING
+                RETURNING user_id
+            """, (user_id, _PASSWORD_HASHER.hash(password), name))
+            created = cursor.fetchone() is not None
+        if created:
+            _USER_EXISTS_CACHE.set(user_id, True)
+        return created
     except Exception as e:
         logger.error(f"회원가입 실패: {e}")
         return False
 
 
 def authenticate_user_db(user_id, password):
-    """로그인: 아이디/비번 일치 확인"""
+    """
+    로그인: 아이디/비번 일치 확인 (매번 argon2로 검증)
+    평문으로 저장돼 있던 예전 계정은 로그인 성공 시 argon2 해시로 바꿔 저장합니다.
+    """
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
+        with _conn() as conn, conn.cursor() as cursor:
+            _execute_prepared(conn, cursor, "auth_user",
+                              "SELECT password, name FROM users WHERE user_id = $1", (user_id,))
+            row = cursor.fetchone()
+        if not row:
+            return None
 
-        cursor.execute("SELECT password, name FROM users WHERE user_id = %s", (user_id,))
-        row = cursor.fetchone()
+        stored, name = row
+        if not _verify_password(stored, password):
+            return None
 
-        cursor.close()
-        conn.close()
+        if not stored.startswith("$argon2") or _PASSWORD_HASHER.check_needs_rehash(stored):
+            with _conn() as conn, conn.cursor() as cursor:
+                cursor.execute("UPDATE users SET password = %s WHERE user_id = %s",
+                               (_PASSWORD_HASHER.hash(password), user_id))
 
-        if row and row[0] == password:  # 비밀번호 일치 (실무에선 해시 암호화 필수)
-            return {"user_id": user_id, "name": row[1]}
-        return None
+        return {"user_id": user_id, "name": name}
     except Exception as e:
         logger.error(f"로그인 검사 실패: {e}")
         return None
 
 
 def check_user_exists_db(user_id):
-    """아이디가 DB에 진짜 존재하는지 확인"""
+    """아이디가 DB에 진짜 존재하는지 확인 (존재 확인된 아이디는 _USER_EXISTS_CACHE에서 바로 반환)"""
+    if _USER_EXISTS_CACHE.get(user_id):
+        return True
+
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1 FROM users WHERE user_id = %s", (user_id,))
-        exists = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        return True if exists else False
-    except:
+        with _conn() as conn, conn.cursor() as cursor:
+            _execute_prepared(conn, cursor, "chk_user",
+                              "SELECT EXISTS (SELECT 1 FROM users WHERE user_id = $1)", (user_id,))
+            exists = cursor.fetchone()[0]
+        if exists:
+            _USER_EXISTS_CACHE.set(user_id, True)
+        return exists
+    except Exception as e:
+        logger.error(f"회원 확인 실패: {e}")
         return False
 
 
+# 히스토리 조회 시 서버 측 커서에서 한 번에 받아 올 행 수
+HISTORY_FETCH_SIZE = 100
+
+
 def search_skin_history_db(
         user_id: str,
         condition: str = None,
         start_date: str = None,
         end_date: str = None,
         page: int = 1,
-        page_size: int = 200
+        page_size: int = 200,
+        cursor: str = None,
+        detail: bool = True
 ):
-    try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
+    """
+    분석 기록(+추천 결과)을 조건/기간으로 검색해 한 페이지 분량만 반환합니다.
+    DB에서 잘라 온 행을 서버 측 커서로 나눠 받아(itersize)
+    한 행씩 바로 응답 형식으로 변환합니다. (fetchall로 전체를 한꺼번에 올리지 않음)
+
+    페이지 이동 방식:
+    - cursor 사용 (권장): 이전 응답의 next_cursor를 넘기면 그 다음 행부터 조회합니다.
+      (created_at, id) 기준으로 바로 찾아가므로 뒤쪽 페이지도 앞쪽과 같은 비용입니다.
+    - page 사용 (기존 방식): LIMIT/OFFSET. 페이지 번호로 바로 이동할 때만 사용하세요.
+
+    cursor로 조회할 때는 전체 개수를 세지 않으므로 total_count/total_pages가 None입니다.
+    (개수는 첫 페이지(page 방식)에서 받아 두세요)
+
+    detail=False면 목록 화면용으로 recommendation_log를 JOIN 하지 않고 점수만 반환합니다.
+    (피부 나이, 추천 제품/루틴은 빠짐 - 응답이 훨씬 작음, 상세는 get_skin_history_detail_db로 조회)
 
-        # 1. 기본 쿼리
+    Raises:
+        ValueError: cursor 형식이 잘못된 경우 (호출하는 쪽에서 400으로 응답)
+    """
+    # 잘못된 커서는 '빈 결과'가 아니라 요청 오류이므로 조회 전에 먼저 검사해 호출자에게 그대로 전달
+    cursor_pos = _decode_history_cursor(cursor) if cursor else None
+
+    try:
+        # 1. 기본 쿼리 (조건은 analysis_log 컬럼에만 걸림)
         base_query = """
-                    FROM analysis_log a
-                    LEFT JOIN recommendation_log r ON a.id = r.analysis_id
                     WHERE a.user_id = %s
                 """
         params = [user_id]
@@ -635,90 +1113,190 @@ def search_skin_history_db(
             base_query += " AND a.created_at <= %s"
             params.append(end_date + " 23:59:59")
 
-        # 4. 개수 세기
-        count_sql = f"SELECT COUNT(*) {base_query}"
-        cursor.execute(count_sql, tuple(params))
-        total_count = cursor.fetchone()[0]
+        # 4. 개수 세기 (page 방식에서 범위를 벗어나 페이지 조회로 구하지 못한 경우에만 사용)
+        count_sql = f"""
+                    SELECT COUNT(*)
+                    FROM analysis_log a
+                    {base_query}
+                """
 
         # 5. 데이터 조회 (⭐️ 수정됨: 추천 정보 컬럼 추가!)
-        offset = (page - 1) * page_size
+        # 이번 페이지에 해당하는 분석 id만 먼저 고름 (인덱스만으로 처리되는 좁은 조회)
+        if cursor_pos:
+            # 이전 페이지 마지막 행보다 오래된 행부터 (OFFSET 없이 인덱스 범위 조회)
+            last_created_at, last_id = cursor_pos
+            page_query = base_query + " AND (a.created_at, a.id) < (%s, %s)"
+            page_params = params + [last_created_at, last_id, page_size]
+            limit_sql = "LIMIT %s"
+            total_sql = "NULL::bigint"
+        else:
+            # OFFSET으로 건너뛰는 행도 id만 읽고 버림 (넓은 JSON 컬럼은 읽지 않음)
+            offset = (page - 1) * page_size
+            page_query = base_query
+            page_params = params + [page_size, offset]
+            limit_sql = "LIMIT %s OFFSET %s"
+            # 전체 개수를 같은 쿼리에서 함께 계산 (LIMIT 전에 계산되므로 전체 기준)
+            total_sql = "COUNT(*) OVER ()"
+
+        # 고른 id에 대해서만 넓은 컬럼(추천 JSON 등)을 붙여서 가져옴 (Deferred Join)
         data_sql = f"""
-                    SELECT 
-                        a.id, a.created_at, 
-                        a.moisture, a.sebum, a.redness, a.pores, a.wrinkles, a.acne, a.pigmentation,
-                        a.image_path, 
-                        r.skin_age,
-                        r.top3_products, r.routine_am, r.routine_pm
-                    {base_query}
-                    ORDER BY a.created_at DESC
-                    LIMIT %s OFFSET %s
+                    SELECT {_history_columns(detail)}, page_ids.total_count
+                    FROM (
+                        SELECT a.id, {total_sql} AS total_count
+                        FROM analysis_log a
+                        {page_query}
+                        ORDER BY a.created_at DESC, a.id DESC
+                        {limit_sql}
+                    ) page_ids
+                    JOIN analysis_log a ON a.id = page_ids.id
+                    {_HISTORY_JOINS if detail else ""}
+                    ORDER BY a.created_at DESC, a.id DESC
                 """
-        full_params = params + [page_size, offset]
-
-        cursor.execute(data_sql, tuple(full_params))
-        rows = cursor.fetchall()
-
-        cursor.close()
-        conn.close()
 
         records = []
-        for r in rows:
-            # 인덱스: 0~8(점수), 9(이미지), 10(나이), 11(제품), 12(아침), 13(저녁)
-
-            # DB에 JSON 문자열로 저장된 것을 파이썬 객체(List/Dict)로 복원
-            top3_raw = r[11]
-            routine_am_raw = r[12]
-            routine_pm_raw = r[13]
-
-            top3 = json.loads(top3_raw) if top3_raw else []
-            routine_am = json.loads(routine_am_raw) if routine_am_raw else []
-            routine_pm = json.loads(routine_pm_raw) if routine_pm_raw else []
-
-            # 점수 계산
-            moisture = r[2] or 0
-            sebum = r[3] or 0
-            redness = r[4] or 0
-            pore = r[5] or 0
-            wrinkles = r[6] or 0
-            acne = r[7] or 0
-            pigmentation = r[8] or 0
-
-            negative_sum = acne + wrinkles + pore + redness + pigmentation
-            overall_score = max(0, 100 - int(negative_sum / 5))
-
-            records.append({
-                "id": r[0],
-                "date": r[1].strftime("%Y-%m-%d %H:%M"),
-                "image_path": r[9],
-                "skin_age": r[10] if r[10] else 0,
-                "overall_score": overall_score,
-
-                # 앱으로 보낼 추가 정보
-                "products": top3,
-                "routine": {
-                    "am": routine_am,
-                    "pm": routine_pm
-                },
-
-                "scores": {
-                    "moisture": moisture, "sebum": sebum,
-                    "redness": redness, "pore": pore,
-                    "wrinkles": wrinkles, "acne": acne,
-                    "pigmentation": pigmentation
-                }
-            })
+        last_row = None
+        with _conn() as conn:
+            # 서버 측(named) 커서: 행을 HISTORY_FETCH_SIZE개씩 나눠 받음
+            with conn.cursor(name="history_cur", cursor_factory=RealDictCursor) as cur:
+                cur.itersize = HISTORY_FETCH_SIZE
+                cur.execute(data_sql, tuple(page_params))
+                for r in cur:
+                    records.append(_history_record(r, detail))
+                    last_row = r
+
+            if cursor_pos:
+                total_count = None  # 커서 조회는 개수를 세지 않음 (매 페이지 전체 스캔 방지)
+            elif last_row is not None:
+                total_count = last_row["total_count"]
+            elif page <= 1:
+                total_count = 0  # 첫 페이지가 비었으면 전체도 0건
+            else:
+                # 범위를 벗어난 페이지: 개수만 따로 조회
+                with conn.cursor() as cur:
+                    cur.execute(count_sql, tuple(params))
+                    total_count = cur.fetchone()[0]
+
+        # 한 페이지가 꽉 찼으면 다음 페이지가 있을 수 있으므로 다음 커서 발급
+        next_cursor = None
+        if last_row is not None and len(records) == page_size:
+            next_cursor = _encode_history_cursor(last_row["created_at"], last_row["id"])
 
-        import math
         return {
             "total_count": total_count,
-            "total_pages": math.ceil(total_count / page_size),
-            "current_page": page,
+            "total_pages": None if total_count is None else math.ceil(total_count / page_size),
+            "current_page": None if cursor_pos else page,
+            "next_cursor": next_cursor,
             "records": records
         }
 
     except Exception as e:
         logger.error(f"히스토리 조회 실패: {e}")
-        return {"total_count": 0, "records": []}
+        return {
+            "total_count": 0,
+            "total_pages": 0,
+            "current_page": None if cursor_pos else page,
+            "next_cursor": None,
+            "records": []
+        }
+
+
+def get_skin_history_detail_db(user_id: str, analysis_id: int):
+    """
+    분석 기록 1건을 추천 제품/루틴까지 포함해 반환합니다. (목록은 detail=False로 가볍게 받고 상세는 이걸로 조회)
+    본인 기록이 아니거나 없으면 None을 반환합니다.
+    """
+    try:
+        query = f"""
+            SELECT {_history_columns(True)}
+            FROM analysis_log a
+            {_HISTORY_JOINS}
+            WHERE a.id = %s AND a.user_id = %s
+            LIMIT 1
+        """
+        with _conn() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(query, (analysis_id, user_id))
+            row = cursor.fetchone()
+        return _history_record(row, True) if row else None
+
+    except Exception as e:
+        logger.error(f"히스토리 상세 조회 실패: {e}")
+        return None
+
+
+# 히스토리 상세 조회용 JOIN (추천 기록, 목록 조회(detail=False)에서는 붙이지 않음)
+_HISTORY_JOINS = """
+                    LEFT JOIN recommendation_log r ON a.id = r.analysis_id
+"""
+
+# NULL 점수는 0으로 계산 (종합 점수는 아래 5개 부정 항목 기준)
+_HISTORY_SCORE_COLUMNS = ("moisture", "sebum", "redness", "pores", "wrinkles", "acne", "pigmentation")
+_HISTORY_NEGATIVE_COLUMNS = ("acne", "wrinkles", "pores", "redness", "pigmentation")
+
+
+def _history_columns(detail: bool) -> str:
+    """
+    [내부 함수] 히스토리 조회 SELECT 컬럼
+    detail=False면 analysis_log 컬럼만 사용하므로 recommendation_log를 JOIN 하지 않아도 됩니다.
+    (피부 나이, 추천 JSON 컬럼은 상세 조회에서만)
+    """
+    scores = ", ".join(f"COALESCE(a.{c}, 0) AS {c}" for c in _HISTORY_SCORE_COLUMNS)
+    negative_sum = " + ".join(f"COALESCE(a.{c}, 0)" for c in _HISTORY_NEGATIVE_COLUMNS)
+    columns = f"""
+                        a.id, a.created_at, a.image_path,
+                        {scores},
+                        GREATEST(0, 100 - ({negative_sum}) / 5) AS overall_score"""
+    if detail:
+        columns += """,
+                        r.skin_age,
+                        COALESCE(r.top3_products, '[]') AS top3_products,
+                        COALESCE(r.routine_am, '[]') AS routine_am,
+                        COALESCE(r.routine_pm, '[]') AS routine_pm"""
+    return columns
+
+
+def _encode_history_cursor(created_at: datetime, row_id: int) -> str:
+    """[내부 함수] 히스토리 다음 페이지 위치(created_at, id)를 불투명한 문자열로 만듭니다."""
+    raw = f"{created_at.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_history_cursor(cursor: str) -> tuple:
+    """[내부 함수] _encode_history_cursor로 만든 문자열을 (created_at, id)로 되돌립니다."""
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except ValueError as e:
+        raise ValueError(f"잘못된 히스토리 커서입니다: {cursor}") from e
+
+
+def _history_record(r, detail: bool = True) -> dict:
+    """
+    [내부 함수] search_skin_history_db의 조회 행 하나를 응답 형식(dict)으로 변환합니다.
+    (NULL 처리, 종합 점수 계산, JSONB 변환은 SQL/psycopg2에서 끝난 상태)
+    """
+    record = {
+        "id": r["id"],
+        "date": r["created_at"].strftime("%Y-%m-%d %H:%M"),
+        "image_path": r["image_path"],
+        "overall_score": r["overall_score"],
+    }
+
+    # 앱으로 보낼 추가 정보 (상세 조회일 때만)
+    if detail:
+        record["skin_age"] = r["skin_age"] or 0
+        record["products"] = r["top3_products"]
+        record["routine"] = {
+            "am": r["routine_am"],
+            "pm": r["routine_pm"]
+        }
+
+    record["scores"] = {
+        "moisture": r["moisture"], "sebum": r["sebum"],
+        "redness": r["redness"], "pore": r["pores"],
+        "wrinkles": r["wrinkles"], "acne": r["acne"],
+        "pigmentation": r["pigmentation"]
+    }
+    return record
 
 
 def get_skin_period_stats_db(user_id: str, start_date: str, end_date: str):
@@ -726,46 +1304,37 @@ def get_skin_period_stats_db(user_id: str, start_date: str, end_date: str):
     특정 기간 동안의 피부 상태 통계(평균 점수, 측정 횟수 등)를 계산하여 반환합니다.
     """
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-
-        # 1. 평균 점수 계산 (AVG 함수 사용)
+        # 평균 점수 + 피부 나이 평균을 쿼리 1번으로 계산 (각 테이블의 user_id, created_at 인덱스 사용)
         # COALESCE(AVG(...), 0): 데이터가 없어서 NULL이 나오면 0으로 바꿔줌
         stat_query = """
-            SELECT 
-                COUNT(*),
-                COALESCE(AVG(moisture), 0),
-                COALESCE(AVG(sebum), 0),
-                COALESCE(AVG(redness), 0),
-                COALESCE(AVG(pores), 0),
-                COALESCE(AVG(wrinkles), 0),
-                COALESCE(AVG(acne), 0)
-            FROM analysis_log
-            WHERE user_id = %s 
-              AND created_at >= %s 
-              AND created_at <= %s
+            WITH a AS (
+                SELECT
+                    COUNT(*) AS cnt,
+                    COALESCE(AVG(moisture), 0) AS moisture,
+                    COALESCE(AVG(sebum), 0) AS sebum,
+                    COALESCE(AVG(redness), 0) AS redness,
+                    COALESCE(AVG(pores), 0) AS pores,
+                    COALESCE(AVG(wrinkles), 0) AS wrinkles,
+                    COALESCE(AVG(acne), 0) AS acne
+                FROM analysis_log
+                WHERE user_id = %(user_id)s
+                  AND created_at BETWEEN %(start)s AND %(end)s
+            ), r AS (
+                SELECT COALESCE(AVG(skin_age), 0) AS skin_age
+                FROM recommendation_log
+                WHERE user_id = %(user_id)s
+                  AND created_at BETWEEN %(start)s AND %(end)s
+            )
+            SELECT a.cnt, a.moisture, a.sebum, a.redness, a.pores, a.wrinkles, a.acne, r.skin_age
+            FROM a, r
         """
 
         # 날짜 포맷 맞추기 (시작일 00:00 ~ 종료일 23:59)
-        s_date = start_date
-        e_date = end_date + " 23:59:59"
-
-        cursor.execute(stat_query, (user_id, s_date, e_date))
-        row = cursor.fetchone()
-
-        # 2. 피부 나이 평균 계산 (recommendation_log 테이블 조회)
-        age_query = """
-            SELECT COALESCE(AVG(skin_age), 0)
-            FROM recommendation_log
-            WHERE user_id = %s 
-              AND created_at >= %s 
-              AND created_at <= %s
-        """
-        cursor.execute(age_query, (user_id, s_date, e_date))
-        avg_age = cursor.fetchone()[0]
+        params = {"user_id": user_id, "start": start_date, "end": end_date + " 23:59:59"}
 
-        cursor.close()
-        conn.close()
+        with _conn() as conn, conn.cursor() as cursor:
+            cursor.execute(stat_query, params)
+            row = cursor.fetchone()
 
         # 데이터가 하나도 없으면 0 리턴
         count = row[0]
@@ -781,7 +1350,7 @@ def get_skin_period_stats_db(user_id: str, start_date: str, end_date: str):
             "avg_pore": round(row[4], 1),
             "avg_wrinkle": round(row[5], 1),
             "avg_acne": round(row[6], 1),
-            "avg_skin_age": round(avg_age, 1)
+            "avg_skin_age": round(row[7], 1)
         }
 
     except Exception as e:
@@ -792,17 +1361,17 @@ def get_skin_period_stats_db(user_id: str, start_date: str, end_date: str):
 def save_analysis_log_db(user_id, file_path, scores, total_score=0): # 👈 total_score 인자 추가
     """
     [DB 저장 전담] 분석 결과와 이미지 경로, 그리고 '종합 점수'를 DB에 저장합니다.
+    가입된 회원인지도 같은 INSERT 안에서 확인하므로 별도 조회 없이, 없는 아이디면 저장하지 않고 None을 반환합니다.
     """
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-
         # 쿼리에 total_score 컬럼 추가
+        # (users에 아이디가 있을 때만 INSERT - $1은 users.user_id와 비교하기 위해 VARCHAR로 지정)
         insert_sql = """
             INSERT INTO analysis_log 
             (user_id, image_path, moisture, sebum, redness, pores, wrinkles, acne, pigmentation, total_score)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id;
+            SELECT $1, $2, $3, $4, $5, $6, $7, $8, $9, $10
+            WHERE EXISTS (SELECT 1 FROM users WHERE user_id = $1::VARCHAR)
+            RETURNING id
         """
         # 딕셔너리에서 값 추출
         params = (
@@ -812,13 +1381,17 @@ def save_analysis_log_db(user_id, file_path, scores, total_score=0): # 👈 tota
             total_score
         )
 
-        cursor.execute(insert_sql, params)
-        new_id = cursor.fetchone()[0]
+        with _conn() as conn, conn.cursor() as cursor:
+            _execute_prepared(conn, cursor, "ins_analysis", insert_sql, params)
+            row = cursor.fetchone()
 
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return new_id
+        if row is None:
+            logger.warning(f"존재하지 않는 회원의 분석 저장 요청: {user_id}")
+            return None
+
+        # 저장에 성공했으면 가입된 아이디이므로 히스토리 조회 시 존재 확인을 건너뛸 수 있게 기록
+        _USER_EXISTS_CACHE.set(user_id, True)
+        return row[0]
 
     except Exception as e:
         logger.error(f"DB 저장 실패: {e}")
@@ -829,107 +1402,173 @@ def save_analysis_log_db(user_id, file_path, scores, total_score=0): # 👈 tota
 # 5. AI 모델 학습 (Training)
 # ==============================================================================
 
+def _training_row(user_id: str, payload: dict) -> tuple:
+    """[내부 함수] 요청 데이터를 training_log 한 행(_TRAINING_COLUMNS 순서)으로 변환합니다."""
+    # 2. 데이터 추출
+    cam = payload["camera"]
+    env = payload["env"]
+    life = payload["lifestyle"]
+
+    # Hot 세안 여부, 민감성 여부는 0/1 숫자로 변환
+    is_hot = 1 if str(life.get("wash_temp", "")).lower() == "hot" else 0
+    is_sens = 1 if str(life.get("sensitivity", "")).lower() == "yes" else 0
+
+    return (
+        user_id,
+        float(cam.get("redness", 0)), float(cam.get("sebum", 0)),
+        float(cam.get("moisture", 0)), float(cam.get("acne", 0)),
+        float(env.get("uv", 0)), float(env.get("humidity", 0)), float(env.get("temperature", 0)),
+        float(life.get("sleep_hours_7d", 7)), int(life.get("water_intake_ml", 1500)),
+        float(life.get("wash_freq_per_day", 2)), is_hot, is_sens
+    )
+
+
 def save_training_log_db(user_id: str, payload: dict):
     """
     [데이터 수집] AI 학습을 위해 모든 환경/피부/생활 변수를 DB에 기록합니다.
     (final_skin.py의 log_today 역할)
+    바로 저장하지 않고 _TRAINING_WRITER 큐에 넣어 두면 백그라운드에서 묶어서 저장합니다.
     """
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
+        # 3. 데이터 삽입 (큐에 등록)
+        _TRAINING_WRITER.submit(_training_row(user_id, payload))
+        logger.info(f"📝 [Training] 학습 데이터 기록 요청 (User: {user_id})")
 
-        # 2. 데이터 추출
-        cam = payload["camera"]
-        env = payload["env"]
-        life = payload["lifestyle"]
+    except Exception as e:
+        logger.error(f"⚠️ 학습 데이터 저장 실패: {e}")
 
-        # Hot 세안 여부, 민감성 여부는 0/1 숫자로 변환
-        is_hot = 1 if str(life.get("wash_temp", "")).lower() == "hot" else 0
-        is_sens = 1 if str(life.get("sensitivity", "")).lower() == "yes" else 0
 
-        # 3. 데이터 삽입
-        insert_sql = """
-            INSERT INTO training_log 
-            (user_id, redness, sebum, moisture, acne, uv, humidity, temperature, 
-             sleep_hours, water_intake, wash_freq, is_hot_wash, is_sensitive)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(insert_sql, (
-            user_id,
-            float(cam.get("redness", 0)), float(cam.get("sebum", 0)),
-            float(cam.get("moisture", 0)), float(cam.get("acne", 0)),
-            float(env.get("uv", 0)), float(env.get("humidity", 0)), float(env.get("temperature", 0)),
-            float(life.get("sleep_hours_7d", 7)), int(life.get("water_intake_ml", 1500)),
-            float(life.get("wash_freq_per_day", 2)), is_hot, is_sens
-        ))
-
-        conn.commit()
-        cursor.close()
-        conn.close()
-        logger.info(f"📝 [Training] 학습 데이터 기록 완료 (User: {user_id})")
+def save_training_logs_bulk(rows: list) -> int:
+    """
+    [대량 적재] 여러 건의 학습 데이터를 COPY로 한 번에 저장합니다. (과거 데이터 이관 등)
+
+    Args:
+        rows (list): [(user_id, payload), ...]
+
+    Returns:
+        int: 저장한 행 수 (실패 시 0)
+    """
+    if not rows:
+        return 0
+
+    try:
+        with _conn() as conn, conn.cursor() as cursor:
+            copy_rows(cursor, "training_log", _TRAINING_COLUMNS,
+                      (_training_row(user_id, payload) for user_id, payload in rows))
+
+        logger.info(f"📝 [Training] 학습 데이터 {len(rows)}건 일괄 저장 완료")
+        return len(rows)
 
     except Exception as e:
-        logger.error(f"⚠️ 학습 데이터 저장 실패: {e}")
+        logger.error(f"⚠️ 학습 데이터 일괄 저장 실패: {e}")
+        return 0
 
 
-def train_model_from_db():
+def _copy_text(value) -> str:
+    """[내부 함수] COPY(텍스트 형식)용 값 변환 (None은 NULL, 탭/줄바꿈/역슬래시 이스케이프)"""
+    if value is None:
+        return "\\N"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def copy_rows(cursor, table: str, columns: tuple, rows) -> None:
     """
-    [모델 재학습] DB에 쌓인 데이터를 읽어와 AI 모델을 업데이트합니다.
-    (final_skin.py의 train_trouble_model 역할)
+    [대량 적재] 행들을 탭 구분 텍스트로 메모리 버퍼에 쓴 뒤 COPY ... FROM STDIN으로 한 번에 저장합니다.
+    (save_training_logs_bulk, generated_skin_data.py 더미 데이터 생성에서 같이 사용)
+
+    Args:
+        cursor: psycopg2 커서 (commit은 호출한 쪽에서 처리)
+        table (str): 대상 테이블 이름
+        columns (tuple): 행 값 순서와 같은 컬럼 이름들
+        rows (iterable): 값 튜플들 (None은 NULL로 저장)
     """
-    from sklearn.linear_model import LogisticRegression
-    from sklearn.preprocessing import StandardScaler
-    from sklearn.pipeline import Pipeline
-    import pandas as pd
+    buf = io.StringIO()
+    for row in rows:
+        buf.write("\t".join(_copy_text(v) for v in row))
+        buf.write("\n")
+    buf.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT text)", buf)
 
-    logger.info("🎓 [Training] 모델 재학습 프로세스 시작...")
 
-    try:
-        conn = psycopg2.connect(**DB_CONFIG)
+# 학습 피처 컬럼 (순서 = 모델 입력 순서, _extract_trouble_features와 동일)
+_TRAINING_FEATURE_COLUMNS = _TRAINING_COLUMNS[1:]
 
-        # 1. DB에서 모든 로그 가져오기 (시간순 정렬)
-        query = "SELECT * FROM training_log ORDER BY user_id, created_at ASC"
-        df = pd.read_sql(query, conn)
-        conn.close()
+# 재학습 시 서버 측 커서에서 한 번에 받아 올 행 수
+TRAINING_FETCH_SIZE = 10000
 
-        if len(df) < 50:
-            logger.warning(f"데이터 부족({len(df)}개). 최소 50개 이상 쌓이면 학습하세요.")
-            return {"status": "skipped", "msg": "데이터 부족"}
 
-        # 2. 라벨링 (Labeling): 2일 뒤 홍조가 악화되었는가?
-        X = []
-        y = []
+def _build_training_pairs(user_ids: list, data: np.ndarray, horizon: int = 2) -> tuple:
+    """
+    [내부 함수] 사용자별 시간순 기록에서 (현재 피처, horizon 뒤 악화 여부) 학습 쌍을 만듭니다.
 
-        # 사용자별로 그룹화해서 미래 데이터 비교
-        grouped = df.groupby("user_id")
+    Args:
+        user_ids (list): 각 행의 user_id (사용자별로 모여 있고, 사용자 안에서는 시간순)
+        data (np.ndarray): (행 수, 12) 피처 배열 (_TRAINING_FEATURE_COLUMNS 순서, 0열이 홍조)
 
-        horizon_days = 2  # 2일 뒤 예측
+    Returns:
+        tuple: (X (N, 12) float 배열, y (N,) 0/1 배열)
+    """
+    # 사용자가 바뀌는 위치로 구간 나누기
+    users = np.asarray(user_ids, dtype=object)
+    bounds = np.flatnonzero(users[1:] != users[:-1]) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(users)]))
 
-        for user, group in grouped:
-            # 날짜 인덱스 설정
-            group = group.sort_values("created_at")
-            vals = group.to_dict("records")
+    X_parts, y_parts = [], []
+    for start, end in zip(starts, ends):
+        if end - start <= horizon:
+            continue
+        seg = data[start:end]
 
-            for i in range(len(vals) - horizon_days):
-                curr = vals[i]
-                future = vals[i + horizon_days]
+        # 라벨 (정답): 미래 홍조가 60 이상이고, 현재보다 8 이상 증가했으면 '악화(1)'
+        red_now = seg[:-horizon, 0]
+        red_fut = seg[horizon:, 0]
+        X_parts.append(seg[:-horizon])
+        y_parts.append(((red_fut >= 60) & ((red_fut - red_now) >= 8)).astype(np.int64))
 
-                # 피처 벡터 (입력)
-                features = [
-                    curr["redness"], curr["sebum"], curr["moisture"], curr["acne"],
-                    curr["uv"], curr["humidity"], curr["temperature"],
-                    curr["sleep_hours"], curr["water_intake"], curr["wash_freq"],
-                    curr["is_hot_wash"], curr["is_sensitive"]
-                ]
+    if not X_parts:
+        return np.empty((0, data.shape[1])), np.empty(0, dtype=np.int64)
+    return np.concatenate(X_parts), np.concatenate(y_parts)
 
-                # 라벨 (정답): 미래 홍조가 60 이상이고, 현재보다 8 이상 증가했으면 '악화(1)'
-                red_now = curr["redness"]
-                red_fut = future["redness"]
 
-                is_trouble = 1 if (red_fut >= 60 and (red_fut - red_now) >= 8) else 0
+def train_model_from_db():
+    """
+    [모델 재학습] DB에 쌓인 데이터를 읽어와 AI 모델을 업데이트합니다.
+    (final_skin.py의 train_trouble_model 역할)
+    """
+    global _MODEL, _MODEL_MTIME, _MODEL_AVAILABLE
+
+    LogisticRegression, Pipeline, StandardScaler = _lazy_sklearn()
 
-                X.append(features)
-                y.append(is_trouble)
+    logger.info("🎓 [Training] 모델 재학습 프로세스 시작...")
+
+    try:
+        # 1. DB에서 모든 로그 가져오기 (시간순 정렬)
+        # (같은 묶음으로 저장돼 created_at이 같은 행은 저장 순서(id)로 정렬)
+        # 서버 측 커서로 TRAINING_FETCH_SIZE개씩 받아 바로 float 배열로 변환 (DataFrame 없이)
+        query = f"""
+            SELECT user_id, {', '.join(_TRAINING_FEATURE_COLUMNS)}
+            FROM training_log
+            ORDER BY user_id, created_at ASC, id ASC
+        """
+        user_ids = []
+        chunks = []
+        with _conn() as conn, conn.cursor(name="train_stream") as cursor:
+            cursor.execute(query)
+            while True:
+                batch = cursor.fetchmany(TRAINING_FETCH_SIZE)
+                if not batch:
+                    break
+                user_ids.extend(r[0] for r in batch)
+                chunks.append(np.array([r[1:] for r in batch], dtype=np.float64))
+
+        if len(user_ids) < 50:
+            logger.warning(f"데이터 부족({len(user_ids)}개). 최소 50개 이상 쌓이면 학습하세요.")
+            return {"status": "skipped", "msg": "데이터 부족"}
+
+        # 2. 라벨링 (Labeling): 2일 뒤 홍조가 악화되었는가?
+        X, y = _build_training_pairs(user_ids, np.vstack(chunks), horizon=2)
 
         if len(X) < 10:
             return {"status": "skipped", "msg": "유효한 학습 샘플(쌍)이 너무 적습니다."}
@@ -942,8 +1581,13 @@ def train_model_from_db():
 
         model.fit(X, y)
 
-        # 4. 저장
-        joblib.dump(model, MODEL_PATH)
+        # 4. 저장 (예측에 쓰는 캐시 모델도 바로 교체)
+        import joblib
+        with _MODEL_LOCK:
+            joblib.dump(model, MODEL_PATH)
+            _MODEL = _compile_predictor(model)
+            _MODEL_MTIME = os.stat(MODEL_PATH).st_mtime
+            _MODEL_AVAILABLE = True
         logger.info(f"✅ 모델 업데이트 완료! (샘플 수: {len(X)})")
         return {"status": "success", "sample_count": len(X)}
 
@@ -3,27 +3,39 @@
 피부 분석 데이터가 부족하기에 더미로 만드는 파일입니다.
 '''
 
+import numpy as np
 import psycopg2
-import random
+from psycopg2.extras import execute_values
 import uuid
 from datetime import datetime, timedelta
 
 # ✅ 기존 config.py에서 설정을 가져옵니다 (핵심!)
 from services.config import DB_CONFIG, SKIN_THRESHOLDS
+from core.utils import copy_rows
 
 # 테이블 이름 (혹시 다르면 수정하세요)
 TABLE_NAME = "analysis_log"
 
+# 생성할 데이터 개수
+ROW_COUNT = 60
+
+# 이 개수 이상이면 INSERT 대신 COPY로 한 번에 흘려 넣음 (대량 생성 시 훨씬 빠름)
+COPY_MIN_ROWS = 1000
+
+COLUMNS = ("id", "user_id", "acne", "wrinkles", "pores", "pigmentation", "redness",
+           "moisture", "sebum", "created_at", "image_path", "total_score")
+
 
 def calculate_total_score(row):
     """
     Total Score = 100 - (5개 부정적 항목 합계 / 5)
+    (항목 값이 배열이면 전체 행을 한 번에 계산)
     """
     negative_sum = (
             row["acne"] + row["wrinkles"] + row["pores"] +
             row["redness"] + row["pigmentation"]
     )
-    return max(0, 100 - int(negative_sum / 5))
+    return np.maximum(0, 100 - negative_sum // 5)
 
 
 def generate_and_insert():
@@ -41,7 +53,7 @@ def generate_and_insert():
         if max_id is None: max_id = 0
         current_id = max_id + 1
 
-        print(f"ℹ️ ID {current_id}번부터 60개의 데이터를 생성합니다.")
+        print(f"ℹ️ ID {current_id}번부터 {ROW_COUNT}개의 데이터를 생성합니다.")
 
         # 3. 데이터 생성 (이전과 동일한 로직)
         scenarios = ['dry', 'oily', 'sensitive', 'pore', 'acne', 'wrinkle', 'perfect', 'random']
@@ -49,67 +61,72 @@ def generate_and_insert():
 
         insert_query = f"""
             INSERT INTO {TABLE_NAME} 
-            (id, user_id, acne, wrinkles, pores, pigmentation, redness, moisture, sebum, created_at, image_path, total_score)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ({', '.join(COLUMNS)})
+            VALUES %s
         """
 
-        for i in range(60):
-            scenario = scenarios[i % len(scenarios)]
-
-            # 기본값
-            row = {
-                "acne": random.randint(5, 45),
-                "wrinkles": random.randint(5, 45),
-                "pores": random.randint(10, 55),
-                "pigmentation": random.randint(5, 45),
-                "redness": random.randint(5, 45),
-                "moisture": random.randint(35, 80),
-                "sebum": random.randint(20, 65)
-            }
-
-            # 시나리오 적용 (config.py의 SKIN_THRESHOLDS 기준 참고)
-            # 건성: 수분 < 30
-            if scenario == 'dry':
-                row["moisture"] = random.randint(10, int(SKIN_THRESHOLDS["dry_limit"]) - 1)
-            # 지성: 유분 > 70
-            elif scenario == 'oily':
-                row["sebum"] = random.randint(int(SKIN_THRESHOLDS["oily_limit"]) + 1, 95)
-            # 민감성: 홍조 > 50
-            elif scenario == 'sensitive':
-                row["redness"] = random.randint(int(SKIN_THRESHOLDS["sensitive_limit"]) + 1, 90)
-            # 모공 고민: 모공 > 60
-            elif scenario == 'pore':
-                row["pores"] = random.randint(int(SKIN_THRESHOLDS["pore_limit"]) + 1, 90)
-            # 트러블성: 여드름 > 50
-            elif scenario == 'acne':
-                row["acne"] = random.randint(int(SKIN_THRESHOLDS["acne_limit"]) + 1, 90)
-            # 탄력 저하: 주름 > 50
-            elif scenario == 'wrinkle':
-                row["wrinkles"] = random.randint(int(SKIN_THRESHOLDS["wrinkle_limit"]) + 1, 90)
-            # 완벽 피부
-            elif scenario == 'perfect':
-                for k in row: row[k] = 10
-                row["moisture"] = 80
-
-            # 점수 계산 및 기타 데이터
-            row["total_score"] = calculate_total_score(row)
-            uid = current_id + i
-            user_id = random.choice(users)
-
-            # 날짜 랜덤 (최근 60일)
-            created_at = (datetime.now() - timedelta(days=random.randint(0, 60))).strftime("%Y-%m-%d %H:%M:%S.%f")
-            image_path = f"temp_uploads/{uuid.uuid4()}.jpg"
-
-            cur.execute(insert_query, (
-                uid, user_id, row["acne"], row["wrinkles"], row["pores"],
-                row["pigmentation"], row["redness"], row["moisture"], row["sebum"],
-                created_at, image_path, row["total_score"]
-            ))
+        # 전체 행의 값을 NumPy로 한 번에 생성 (행마다 random 호출하지 않음)
+        rng = np.random.default_rng()
+        n = ROW_COUNT
+        scenario = np.array(scenarios)[np.arange(n) % len(scenarios)]
+
+        # 기본값 (integers의 high는 포함되지 않으므로 +1)
+        row = {
+            "acne": rng.integers(5, 46, n),
+            "wrinkles": rng.integers(5, 46, n),
+            "pores": rng.integers(10, 56, n),
+            "pigmentation": rng.integers(5, 46, n),
+            "redness": rng.integers(5, 46, n),
+            "moisture": rng.integers(35, 81, n),
+            "sebum": rng.integers(20, 66, n)
+        }
+
+        # 시나리오 적용 (config.py의 SKIN_THRESHOLDS 기준 참고)
+        # (시나리오, 바꿀 항목, 최솟값, 최댓값)
+        overrides = [
+            ('dry', "moisture", 10, int(SKIN_THRESHOLDS["dry_limit"]) - 1),         # 건성: 수분 < 30
+            ('oily', "sebum", int(SKIN_THRESHOLDS["oily_limit"]) + 1, 95),          # 지성: 유분 > 70
+            ('sensitive', "redness", int(SKIN_THRESHOLDS["sensitive_limit"]) + 1, 90),  # 민감성: 홍조 > 50
+            ('pore', "pores", int(SKIN_THRESHOLDS["pore_limit"]) + 1, 90),          # 모공 고민: 모공 > 60
+            ('acne', "acne", int(SKIN_THRESHOLDS["acne_limit"]) + 1, 90),           # 트러블성: 여드름 > 50
+            ('wrinkle', "wrinkles", int(SKIN_THRESHOLDS["wrinkle_limit"]) + 1, 90),  # 탄력 저하: 주름 > 50
+        ]
+        for name, key, low, high in overrides:
+            mask = scenario == name
+            row[key][mask] = rng.integers(low, high + 1, int(mask.sum()))
+
+        # 완벽 피부
+        perfect = scenario == 'perfect'
+        for k in row: row[k][perfect] = 10
+        row["moisture"][perfect] = 80
+
+        # 점수 계산 및 기타 데이터
+        row["total_score"] = calculate_total_score(row)
+        ids = range(current_id, current_id + n)
+        user_ids = rng.choice(users, n)
+
+        # 날짜 랜덤 (최근 60일)
+        now = datetime.now()
+        created_at = [(now - timedelta(days=d)).strftime("%Y-%m-%d %H:%M:%S.%f")
+                      for d in rng.integers(0, 61, n).tolist()]
+        image_paths = [f"temp_uploads/{uuid.uuid4()}.jpg" for _ in range(n)]
+
+        # 열(배열)들을 행 튜플로 묶음 (psycopg2가 받을 수 있도록 tolist로 파이썬 int 변환)
+        rows = list(zip(
+            ids, user_ids.tolist(), row["acne"].tolist(), row["wrinkles"].tolist(), row["pores"].tolist(),
+            row["pigmentation"].tolist(), row["redness"].tolist(), row["moisture"].tolist(), row["sebum"].tolist(),
+            created_at, image_paths, row["total_score"].tolist()
+        ))
+
+        if len(rows) >= COPY_MIN_ROWS:
+            copy_rows(cur, TABLE_NAME, COLUMNS, rows)
+        else:
+            execute_values(cur, insert_query, rows, page_size=1000)
 
         conn.commit()
         cur.close()
         conn.close()
-        print(f"🎉 데이터 주입 완료! (Total: {current_id + 59}번까지 저장됨)")
+        print(f"🎉 데이터 주입 완료! (Total: {current_id + ROW_COUNT - 1}번까지 저장됨)")
 
     except Exception as e:
         print(f"❌ 오류 발생: {e}")
@@ -9,9 +9,11 @@ import os
 import logging
 from typing import Optional
 
+import orjson
+
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Body, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
@@ -23,17 +25,20 @@ from pydantic import BaseModel
 from services.config import *
 from core.utils import (
     init_db,
+    close_db_pool,
+    start_db_writers,
+    stop_db_writers,
     register_user_db,
     authenticate_user_db,
     check_user_exists_db,
     save_user_profile_db,
     get_user_profile_db,
     search_skin_history_db,
+    get_skin_history_detail_db,
     get_skin_period_stats_db
 )
-from services.skin_analyzer import process_skin_analysis
+from services.skin_analyzer import process_skin_analysis, close_camera, close_sensors
 from services.skin_advisor import run_skin_advisor
-from services.data_collector import run_data_collection
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
@@ -57,13 +62,17 @@ async def lifespan(app: FastAPI):
     # [시작 시 실행]
     print("🔄 서버 시작: DB 테이블을 점검하고 생성합니다...")
     init_db()  # 여기서 DB 초기화 실행
+    start_db_writers()  # 추천 결과 등 기록용 백그라운드 저장 스레드
     print("✅ 서버 시작 완료: DB 초기화 끝")
 
     yield  # 👈 이 yield를 기준으로 위는 '시작', 아래는 '종료' 로직입니다.
 
     # [종료 시 실행]
     print("👋 서버 종료: 리소스를 정리합니다.")
-    # (나중에 DB 연결 종료나 임시 파일 삭제 등이 필요하면 여기에 작성)
+    stop_db_writers()  # 아직 저장 안 된 기록 마저 저장
+    close_db_pool()  # DB 커넥션 풀 정리
+    close_camera()  # 켜 둔 카메라 해제
+    close_sensors()  # 열어 둔 SPI 센서 해제
 
 
 # ---------------------------------------------------------
@@ -90,11 +99,21 @@ app.add_middleware(
 )
 
 # 2. 정적 파일 경로 설정 (이미지 저장소, 웹 페이지)
-os.makedirs("temp_uploads", exist_ok=True)
+# (웹 페이지의 css/js도 /static으로 제공하고, index.html은 read_index 라우트에서만 반환)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 app.mount("/temp_uploads", StaticFiles(directory=UPLOAD_DIR), name="temp_uploads")
 
 
+def orjson_response(content: dict) -> Response:
+    """
+    JSON 기본 타입만 담긴 응답을 orjson으로 바로 직렬화해 반환합니다.
+    (FastAPI 기본 경로인 jsonable_encoder + json.dumps를 건너뜀, 히스토리/분석/추천처럼 중첩된 응답용)
+    NumPy 값이 섞여 있어도 그대로 직렬화되도록 OPT_SERIALIZE_NUMPY를 켭니다.
+    """
+    return Response(content=orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY),
+                    media_type="application/json")
+
+
 # ---------------------------------------------------------
 # [Pydantic Models] 요청 데이터 검증용 모델
 # ---------------------------------------------------------
@@ -131,9 +150,11 @@ async def read_index():
 # ==============================================================================
 # 2. Authentication (회원가입/로그인)
 # ==============================================================================
+# DB/외부 API를 동기 함수로 호출하는 핸들러는 async 없이 def로 선언합니다.
+# (FastAPI가 스레드풀에서 실행하므로 요청 하나가 이벤트 루프 전체를 막지 않음)
 
 @app.post("/signup", tags=["Auth"])
-async def signup(req: SignupRequest):
+def signup(req: SignupRequest):
     if register_user_db(req.user_id, req.password, req.name):
         return {
             "success": True,
@@ -145,7 +166,7 @@ async def signup(req: SignupRequest):
 
 
 @app.post("/login", tags=["Auth"])
-async def login(req: LoginRequest):
+def login(req: LoginRequest):
     user_info = authenticate_user_db(req.user_id, req.password)
     if user_info:
         return {
@@ -163,14 +184,14 @@ async def login(req: LoginRequest):
 # ==============================================================================
 
 @app.get("/user/profile/{user_id}", tags=["User"])
-async def get_profile(user_id: str):
+def get_profile(user_id: str):
     """사용자의 상세 프로필(나이, 수면시간 등) 조회"""
     data = get_user_profile_db(user_id)
     return data if data else {}
 
 
 @app.post("/user/profile", tags=["User"])
-async def save_profile(user_id: str = Body(...), profile_data: dict = Body(...)):
+def save_profile(user_id: str = Body(...), profile_data: dict = Body(...)):
     """(앱/웹 공용) 사용자 프로필 저장 및 업데이트"""
     success = save_user_profile_db(user_id, profile_data)
     if not success:
@@ -195,8 +216,11 @@ async def analyze_skin_endpoint(
     """
     try:
         result = await process_skin_analysis(user_id, file, moisture, sebum)
-        return result
+        return orjson_response(result)
 
+    except HTTPException:
+        # 회원 확인(401), 센서 누락(400) 등 상태 코드가 정해진 에러는 그대로 전달
+        raise
     except Exception as e:
         logger.error(f"분석 요청 처리 중 오류: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -207,7 +231,7 @@ async def analyze_skin_endpoint(
 # ==============================================================================
 
 @app.post("/recommend", tags=["Recommendation"])
-async def recommend_endpoint(req: RecommendationRequest):
+def recommend_endpoint(req: RecommendationRequest):
     """
     [Step 2] 최종 솔루션 요청
     - 분석된 피부 데이터 + 사용자 설문(lifestyle)을 종합하여 제품 및 루틴 추천
@@ -226,7 +250,7 @@ async def recommend_endpoint(req: RecommendationRequest):
         profile_update.update(req.user_pref)
         save_user_profile_db(req.user_id, profile_update)
 
-        return result
+        return orjson_response(result)
 
     except Exception as e:
         logger.error(f"추천 로직 에러: {e}")
@@ -238,39 +262,49 @@ async def recommend_endpoint(req: RecommendationRequest):
 # ==============================================================================
 
 @app.get("/history/search", tags=["History"])
-async def search_history_endpoint(
+def search_history_endpoint(
         user_id: str,
         condition: Optional[str] = None,
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
-        page: int = 1
+        page: int = 1,
+        cursor: Optional[str] = None,
+        detail: bool = True
 ):
     """
     [통합 히스토리 검색 API]
     - 앱과 웹에서 공통으로 사용합니다.
     - 필터(condition), 기간(date), 페이징(page)을 모두 지원합니다.
+    - 다음 페이지는 응답의 next_cursor를 cursor로 넘겨 조회할 수 있습니다. (page보다 빠름, 전체 개수는 첫 페이지에서만 제공)
+    - detail=false면 추천 제품/루틴 없이 점수만 받습니다. (목록 화면용, 상세는 /history/{analysis_id})
     """
     if not check_user_exists_db(user_id):
         raise HTTPException(status_code=401, detail="존재하지 않는 회원입니다.")
 
-    result = search_skin_history_db(
-        user_id=user_id,
-        condition=condition,
-        start_date=start_date,
-        end_date=end_date,
-        page=page
-    )
+    try:
+        result = search_skin_history_db(
+            user_id=user_id,
+            condition=condition,
+            start_date=start_date,
+            end_date=end_date,
+            page=page,
+            cursor=cursor,
+            detail=detail
+        )
+    except ValueError as e:
+        # 변조되었거나 잘린 cursor 값
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return {
+    return orjson_response({
         "status": "success",
         "filter": condition if condition else "all",
         "period": {"start": start_date, "end": end_date},
         "data": result
-    }
+    })
 
 
 @app.get("/history/stats", tags=["History"])
-async def get_stats_endpoint(user_id: str, start_date: str, end_date: str):
+def get_stats_endpoint(user_id: str, start_date: str, end_date: str):
     """
     [통합 통계 API]
     - 특정 기간의 피부 변화 추이(평균 점수 등)를 반환합니다.
@@ -290,6 +324,19 @@ async def get_stats_endpoint(user_id: str, start_date: str, end_date: str):
     }
 
 
+@app.get("/history/{analysis_id}", tags=["History"])
+def get_history_detail_endpoint(analysis_id: int, user_id: str):
+    """
+    [히스토리 상세 API]
+    - 분석 기록 1건을 추천 제품/루틴까지 포함해 반환합니다.
+    """
+    record = get_skin_history_detail_db(user_id, analysis_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="기록을 찾을 수 없습니다.")
+
+    return orjson_response({"status": "success", "data": record})
+
+
 # ==============================================================================
 # 7. 제품 업데이트 기능
 # ==============================================================================
@@ -301,6 +348,9 @@ async def update_products_endpoint(background_tasks: BackgroundTasks):
     크롤링 또는 데이터 갱신 작업을 백그라운드에서 실행합니다.
     (일반 사용자도 요청 가능하도록 권한 해제됨)
     """
+    # 수집기(네이버 API/보강 모듈)는 이 기능에서만 쓰므로 서버 시작 시가 아니라 요청 때 import
+    from services.data_collector import run_data_collection
+
     # 백그라운드에서 크롤링/업데이트 실행 (오래 걸리므로)
     background_tasks.add_task(run_data_collection)
 
@@ -308,17 +358,7 @@ async def update_products_endpoint(background_tasks: BackgroundTasks):
 
 
 # ==============================================================================
-# 8. 웹 사이트 연결 (정적 파일 서빙)
-# ==============================================================================
-
-if os.path.exists("static"):
-    app.mount("/", StaticFiles(directory="static", html=True), name="static")
-else:
-    print("⚠️ 'static' 폴더가 없습니다. 웹 대시보드를 보려면 폴더를 생성하고 파일을 넣으세요.")
-
-
-# ==============================================================================
-# 9. 메인 실행부 (서버 + UI 동시 실행)
+# 8. 메인 실행부 (서버 + UI 동시 실행)
 # ==============================================================================
 if __name__ == "__main__":
     import uvicorn
@@ -11,6 +11,7 @@
 """
 
 import os
+import textwrap
 from dotenv import load_dotenv
 
 # .env 파일 로드 (환경변수 설정)
@@ -170,6 +171,11 @@ GPT_SYSTEM_PROMPT = """
   "redness": [홍조/붉은기 점수]
 }
 """
+# 매 요청마다 앞뒤 공백/들여쓰기 토큰을 보내지 않도록 import 시 한 번만 정리
+GPT_SYSTEM_PROMPT = textwrap.dedent(GPT_SYSTEM_PROMPT).strip()
+
+# [OpenAI] 프롬프트 캐시 키 (같은 시스템 프롬프트 요청을 같은 캐시로 라우팅, 프롬프트 수정 시 버전 올리기)
+GPT_PROMPT_CACHE_KEY = "skin_analyzer_v1"
 
 # ==============================================================================
 # 5. SKIN ANALYSIS CRITERIA (피부 진단 기준값)
@@ -9,12 +9,14 @@ import time
 import json
 import logging
 import psycopg2
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # 외부 모듈
 from .naver_api import get_naver_shopping_data
 from .config import DB_CONFIG
 from .data_enricher import run_hybrid_enrichment
+from core.utils import invalidate_product_cache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -32,6 +34,11 @@ SEARCH_KEYWORDS = {
     "Lotion": ["로션", "에멀전", "올인원"]
 }
 
+# 동시에 보낼 검색 요청 수와 요청 간 대기 시간(초)
+# (스레드 5개 x 0.5초 간격 = 초당 최대 10회, 네이버 API 호출 제한 이내)
+COLLECT_CONCURRENCY = 5
+COLLECT_REQUEST_INTERVAL = 0.5
+
 
 def save_products_raw(product_list):
     """수집된 데이터를 DB에 저장 (태그는 비워둠)"""
@@ -49,8 +56,8 @@ def save_products_raw(product_list):
                 price INTEGER,
                 brand TEXT,
                 official_category TEXT,
-                tags TEXT DEFAULT '[]', 
-                featured_ingredients TEXT DEFAULT '[]',
+                tags JSONB DEFAULT '[]',
+                featured_ingredients JSONB DEFAULT '[]',
                 url TEXT,
                 image_url TEXT,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -82,32 +89,42 @@ def save_products_raw(product_list):
         logger.error(f"DB 저장 실패: {e}")
 
 
+def _fetch_keyword(job):
+    """[내부 함수] 키워드 1개 검색 후 잠시 대기 (스레드마다 호출 간격 유지)"""
+    category, kw = job
+    items = get_naver_shopping_data(kw, display=40)
+    time.sleep(COLLECT_REQUEST_INTERVAL)
+    return category, items
+
+
 def run_data_collection():
     logger.info("🚀 [1단계] 데이터 수집 시작...")
     all_data = []
     seen_names = set()
 
-    for category, keywords in SEARCH_KEYWORDS.items():
-        for kw in keywords:
-            items = get_naver_shopping_data(kw, display=40)
-            if not items: continue
-
-            for item in items:
-                title = item['title']
-                if title in seen_names: continue
-                seen_names.add(title)
-
-                # 태그 분석 없이 기본 정보만 저장
-                product = {
-                    "name": title,
-                    "price": int(item['lprice']),
-                    "brand": item.get('brand', 'Unknown'),
-                    "official_category": category,
-                    "url": item['link'],
-                    "image_url": item['image']
-                }
-                all_data.append(product)
-            time.sleep(0.2)
+    # 키워드별 검색을 여러 스레드로 동시에 요청 (결과는 키워드 순서대로 받음)
+    jobs = [(category, kw) for category, keywords in SEARCH_KEYWORDS.items() for kw in keywords]
+    with ThreadPoolExecutor(max_workers=COLLECT_CONCURRENCY, thread_name_prefix="collector") as executor:
+        results = list(executor.map(_fetch_keyword, jobs))
+
+    for category, items in results:
+        if not items: continue
+
+        for item in items:
+            title = item['title']
+            if title in seen_names: continue
+            seen_names.add(title)
+
+            # 태그 분석 없이 기본 정보만 저장
+            product = {
+                "name": title,
+                "price": int(item['lprice']),
+                "brand": item.get('brand', 'Unknown'),
+                "official_category": category,
+                "url": item['link'],
+                "image_url": item['image']
+            }
+            all_data.append(product)
 
     # 1. 저장 (Raw Data)
     save_products_raw(all_data)
@@ -116,6 +133,9 @@ def run_data_collection():
     logger.info("🚀 [2단계] 하이브리드 데이터 보강 시작 (Regex -> GPT)")
     run_hybrid_enrichment()
 
+    # 3. 추천 엔진이 새 제품 데이터를 쓰도록 캐시 초기화
+    invalidate_product_cache()
+
 
 if __name__ == "__main__":
     run_data_collection()
\ No newline at end of file
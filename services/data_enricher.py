@@ -7,10 +7,11 @@
 """
 
 import re
-import json
 import time
 import logging
+from functools import lru_cache
 import psycopg2
+from psycopg2.extras import Json
 from dotenv import load_dotenv
 
 from .config import DB_CONFIG, STANDARD_TAGS, STANDARD_INGREDIENTS
@@ -81,20 +82,29 @@ PATTERNS = {
 }
 
 
-def analyze_text_local(text):
-    """Regex 엔진: 텍스트에서 성분과 태그 추출"""
-    found_ings = set()
-    found_tags = set()
-    text_lower = text.lower()
+# 표준 목록에 있는 키의 패턴만 import 시 한 번 컴파일해 둡니다. (제품마다 재검사/재컴파일 방지)
+_COMPILED_INGS = tuple(
+    (name, re.compile(pattern)) for name, pattern in PATTERNS["ingredients"].items()
+    if name in STANDARD_INGREDIENTS
+)
+_COMPILED_TAGS = tuple(
+    (name, re.compile(pattern)) for name, pattern in PATTERNS["tags"].items()
+    if name in STANDARD_TAGS
+)
+
 
-    for ing_name, pattern in PATTERNS["ingredients"].items():
-        if ing_name in STANDARD_INGREDIENTS and re.search(pattern, text_lower):
-            found_ings.add(ing_name)
+@lru_cache(maxsize=20000)
+def _match_text(text_lower):
+    """[내부 함수] 소문자 텍스트의 매칭 결과 (같은 제품명이 반복되므로 결과를 캐시)"""
+    found_ings = frozenset(name for name, regex in _COMPILED_INGS if regex.search(text_lower))
+    found_tags = frozenset(name for name, regex in _COMPILED_TAGS if regex.search(text_lower))
+    return found_ings, found_tags
 
-    for tag_name, pattern in PATTERNS["tags"].items():
-        if tag_name in STANDARD_TAGS and re.search(pattern, text_lower):
-            found_tags.add(tag_name)
 
+def analyze_text_local(text):
+    """Regex 엔진: 텍스트에서 성분과 태그 추출"""
+    found_ings, found_tags = _match_text(text.lower())
+    # 호출하는 쪽에서 리스트를 수정하므로 매번 새 리스트로 반환
     return list(found_ings), list(found_tags)
 
 
@@ -123,7 +133,7 @@ def enrich_with_regex():
             tags = list(set(tags))
 
             if ings or tags:
-                updates.append((json.dumps(tags), json.dumps(ings), p_id))
+                updates.append((Json(tags), Json(ings), p_id))
                 count += 1
 
         if updates:
@@ -158,7 +168,7 @@ def get_poor_data_products():
 
         targets = []
         for r in rows:
-            tags = json.loads(r[3]) if r[3] else []
+            tags = r[3] or []  # JSONB -> list
             if len(tags) < 2:
                 targets.append(r)  # 전체 row를 다 넣음
 
@@ -198,14 +208,14 @@ def enrich_with_gpt():
             if p_id in gpt_res:
                 data = gpt_res[p_id]
 
-                old_tags = json.loads(p[3]) if p[3] else []
-                old_ings = json.loads(p[4]) if p[4] else []
+                old_tags = p[3] or []
+                old_ings = p[4] or []
 
                 new_tags = list(set(old_tags + data.get("tags", [])))
                 new_ings = list(set(old_ings + data.get("ingredients", [])))
 
                 # 업데이트 쿼리 준비
-                updates.append((json.dumps(new_tags), json.dumps(new_ings), p[0]))
+                updates.append((Json(new_tags), Json(new_ings), p[0]))
 
         # DB 저장
         if updates:
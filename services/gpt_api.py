@@ -11,12 +11,16 @@ OpenAI API와 통신하는 모든 기능을 전담하는 모듈입니다.
 import os
 import json
 import base64
+import hashlib
 import logging
+import importlib.util
+import httpx
 from openai import OpenAI
 from dotenv import load_dotenv
 
 # 설정 파일 로드
-from .config import GPT_MODEL_NAME, GPT_SYSTEM_PROMPT, STANDARD_TAGS, STANDARD_INGREDIENTS
+from .config import GPT_MODEL_NAME, GPT_SYSTEM_PROMPT, GPT_PROMPT_CACHE_KEY, STANDARD_TAGS, STANDARD_INGREDIENTS
+from core.cache import TTLCache
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
@@ -24,8 +28,17 @@ logger = logging.getLogger(__name__)
 
 # 환경변수 및 클라이언트 로드
 load_dotenv()
+
+# 요청마다 TLS 연결을 새로 맺지 않도록 keep-alive 연결을 넉넉히 유지하는 HTTP 클라이언트를 공유
+# (h2 패키지는 선택 설치 - 있으면 HTTP/2로 한 연결에서 여러 요청을 처리, 없으면 HTTP/1.1)
+_HTTP_CLIENT = httpx.Client(
+    http2=importlib.util.find_spec("h2") is not None,
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+    timeout=60.0,
+)
+
 try:
-    client = OpenAI()
+    client = OpenAI(http_client=_HTTP_CLIENT)
 except Exception as e:
     logger.error(f"OpenAI Client 초기화 실패: {e}")
     client = None
@@ -35,22 +48,53 @@ except Exception as e:
 # 1. 이미지 처리 및 분석 (Vision)
 # ==============================================================================
 
-def encode_image_to_base64(image_path: str) -> str:
-    """이미지 파일을 Base64 문자열로 변환"""
+# 같은 이미지(재촬영 없이 다시 업로드, 테스트 등)는 GPT를 다시 호출하지 않도록 결과를 캐시
+# 키: 이미지 내용의 SHA-256 -> 분석 결과 (성공한 결과만 저장)
+SKIN_ANALYSIS_CACHE_TTL = 24 * 60 * 60  # 초
+_SKIN_ANALYSIS_CACHE = TTLCache(SKIN_ANALYSIS_CACHE_TTL, maxsize=256)
+
+
+def _read_image_bytes(image) -> bytes:
+    """[내부 함수] 이미지 경로 또는 bytes를 bytes로 반환합니다. (실패 시 None)"""
     try:
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+        if isinstance(image, (bytes, bytearray)):
+            return bytes(image)
+        with open(image, "rb") as image_file:
+            return image_file.read()
     except Exception as e:
-        logger.error(f"❌ 이미지 인코딩 실패 ({image_path}): {e}")
+        logger.error(f"❌ 이미지 인코딩 실패 ({image if isinstance(image, str) else 'bytes'}): {e}")
         return None
 
 
-def analyze_skin_image(image_path: str) -> dict:
-    """GPT Vision API에 이미지를 전송하여 피부 상태를 분석합니다."""
+def encode_image_to_base64(image) -> str:
+    """
+    이미지를 Base64 문자열로 변환
+    (image: 파일 경로 또는 이미 메모리에 있는 이미지 bytes - bytes면 파일을 다시 읽지 않음)
+    """
+    image_bytes = _read_image_bytes(image)
+    if image_bytes is None:
+        return None
+    return base64.b64encode(image_bytes).decode('utf-8')
+
+
+def analyze_skin_image(image) -> dict:
+    """
+    GPT Vision API에 이미지를 전송하여 피부 상태를 분석합니다.
+    (image: 파일 경로 또는 이미지 bytes)
+    같은 이미지는 SKIN_ANALYSIS_CACHE_TTL 동안 캐시된 결과를 반환합니다.
+    """
     if not client: return None
 
-    base64_image = encode_image_to_base64(image_path)
-    if not base64_image: return None
+    image_bytes = _read_image_bytes(image)
+    if not image_bytes: return None
+
+    cache_key = hashlib.sha256(image_bytes).hexdigest()
+    cached = _SKIN_ANALYSIS_CACHE.get(cache_key)
+    if cached is not None:
+        logger.info("♻️ 같은 이미지의 GPT 분석 결과 재사용")
+        return dict(cached)
+
+    base64_image = base64.b64encode(image_bytes).decode('utf-8')
 
     try:
         logger.info(f"📤 GPT 피부 분석 요청 시작...")
@@ -64,9 +108,12 @@ def analyze_skin_image(image_path: str) -> dict:
                 ]}
             ],
             max_tokens=500,
-            response_format={"type": "json_object"}
+            response_format={"type": "json_object"},
+            prompt_cache_key=GPT_PROMPT_CACHE_KEY
         )
-        return json.loads(response.choices[0].message.content)
+        result = json.loads(response.choices[0].message.content)
+        _SKIN_ANALYSIS_CACHE.set(cache_key, result)
+        return dict(result)
 
     except Exception as e:
         logger.error(f"⚠️ GPT 피부 분석 실패: {e}")
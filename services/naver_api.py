@@ -27,13 +27,16 @@ CLIENT_SECRET = os.getenv("NAVER_CLIENT_SECRET")
 # 1. 헬퍼 함수 (Helper Functions)
 # ==============================================================================
 
+# 태그 패턴은 한 번만 컴파일 (검색 결과 항목마다 호출되므로)
+_TAG_RE = re.compile(r"<[^>]*>")
+
+
 def clean_html(text: str) -> str:
     """
     문자열에 포함된 HTML 태그(<b>, </b> 등)를 제거합니다.
     네이버 API 검색 결과는 검색어에 <b> 태그가 붙어서 오기 때문입니다.
     """
-    cleanr = re.compile('<.*?>')
-    return re.sub(cleanr, '', text)
+    return _TAG_RE.sub('', text)
 
 
 # ==============================================================================
@@ -7,12 +7,13 @@ API 서버의 요청을 받아, 수집된 데이터를 종합하여
 
 import logging
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 
 # 설정 및 유틸리티
 from .config import *
 from core.utils import (
-    load_products_from_db,
+    get_cached_product_matrix,
     get_current_weather,
     predict_trouble_proba,
     get_skin_data_by_id,
@@ -29,6 +30,9 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 OWM_API_KEY = os.getenv("OWM_API_KEY")
 
+# 서로 독립적인 외부 조회(날씨 API, 제품 DB)를 분석 데이터 조회와 동시에 진행하기 위한 스레드
+_PREFETCH_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="advisor")
+
 
 # ==============================================================================
 # 1. 헬퍼 함수 (Helper Functions)
@@ -65,6 +69,10 @@ def run_skin_advisor(user_id: str, analysis_id: int, lifestyle: dict, user_pref:
     # -------------------------------------------------------
     # Step 1. 데이터 수집 (Data Aggregation)
     # -------------------------------------------------------
+    # 날씨(외부 API, 최대 수 초)와 제품 목록은 서로 무관하므로 먼저 걸어 두고,
+    # 그동안 분석 데이터를 조회합니다. (대기 시간 = 셋 중 가장 느린 것)
+    weather_future = _PREFETCH_EXECUTOR.submit(get_current_weather, OWM_API_KEY)
+    product_future = _PREFETCH_EXECUTOR.submit(get_cached_product_matrix)
 
     # 1. 피부 분석 데이터 로드 (DB)
     camera_data = get_skin_data_by_id(analysis_id)
@@ -77,7 +85,7 @@ def run_skin_advisor(user_id: str, analysis_id: int, lifestyle: dict, user_pref:
         }
 
     # 2. 날씨 정보 로드 (API)
-    env_data = get_current_weather(OWM_API_KEY)
+    env_data = weather_future.result()
 
     # 3. 분석용 Payload 생성
     payload = {
@@ -96,8 +104,8 @@ def run_skin_advisor(user_id: str, analysis_id: int, lifestyle: dict, user_pref:
     # 1. 피부 나이 계산
     skin_age = int(advisor.calc_skin_age())
 
-    # 2. 제품 추천
-    product_db = load_products_from_db()
+    # 2. 제품 추천 (제품 DB는 프로세스 캐시 사용)
+    product_db = product_future.result()
     rec_result = advisor.recommend_products(product_db)
 
     # 3. 루틴 텍스트 생성
@@ -7,20 +7,322 @@
 기능 목록:
 1. Metrics Calculation: 파생 지표(건조도, 민감도 등) 계산
 2. Skin Age Estimation: 피부 나이 추정
-3. Scoring Engine: 제품별 적합도 채점 (가중치 기반)
+3. Scoring Engine: 제품별 적합도 채점 (가중치 기반, NumPy 벡터화)
 4. Routine Generator: 개인화된 루틴 텍스트 생성
 """
 
 import datetime
-from .config import *
+import heapq
+import logging
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from .config import CAT_KO, RULES, TAG_KO
+
+logger = logging.getLogger(__name__)
+
+
+# ==============================================================================
+# 채점 규칙 타깃 -> 태그/성분 매핑 (고정 집합이므로 모듈 로드 시 한 번만 생성)
+# ==============================================================================
+
+RICH_MOIST_TAGS = frozenset({"moisturizing", "rich", "cream"})      # 건조한 날씨 고보습
+LIGHT_GEL_TAGS = frozenset({"light", "gel", "watery"})              # 습한 날씨 산뜻한 제형
+HOT_SEBUM_GEL_TAGS = frozenset({"sebum-care", "pore-care", "gel"})  # 더운 날씨 피지 조절
+BARRIER_CREAM_TAGS = frozenset({"barrier", "ceramide", "cream"})    # 추운 날씨 장벽 보호
+SEBUM_CARE_TAGS = frozenset({"sebum-care", "oily-skin"})            # 유분 과다 피지 케어
+HEAVY_OIL_TAGS = frozenset({"oil", "balm"})                         # 지성 피부 감점 제형
+ACNE_CARE_TAGS = frozenset({"acne-care"})
+ACNE_CARE_INGS = frozenset({"bha", "azelaic", "teatree"})
+SOOTHING_TAGS = frozenset({"soothing"})
+SOOTHING_INGS = frozenset({"cica", "mugwort", "heartleaf"})
+STRONG_ACID_INGS = frozenset({"aha", "bha"})
+ANTI_AGING_TAGS = frozenset({"anti-aging", "firming", "rich"})
+ANTI_AGING_INGS = frozenset({"retinol", "collagen"})
+FRESH_TAGS = frozenset({"light", "fresh", "pore-care"})
+IRRITANT_INGS = frozenset({"aha", "bha", "retinol"})                # 민감성 피부 제외 성분
+
+# RULES 하위 테이블은 자주 조회하므로 모듈 로드 시 이름으로 바인딩
+_ENV_UV = RULES["env_rules"]["uv"]
+_ENV_HUM = RULES["env_rules"]["humidity"]
+_ENV_TEMP = RULES["env_rules"]["temp"]
+_SKIN_SEBUM_HIGH = RULES["skin_rules"]["sebum_high"]
+_SKIN_ACNE_HIGH = RULES["skin_rules"]["acne_high"]
+_SKIN_REDNESS_HIGH = RULES["skin_rules"]["redness_high"]
+
+# 카메라/센서 항목 기본값 (값이 없을 때 사용)
+_CAM_DEFAULTS = {
+    "sebum": 50, "moisture": 50, "redness": 30, "acne": 30,
+    "pore": 50, "wrinkle": 40, "pigmentation": 40, "tone": 50,
+}
+
+# 날씨 등급 구간 (bisect로 한 번에 조회)
+# - UV: 3 이상 mod, 6 이상 high, 8 이상 very
+# - 습도/기온: 하한은 '이하', 상한은 '이상'이라 bisect_left(하한) + bisect_right(상한) 합으로 인덱스 계산
+_UV_THRESHOLDS = (3, 6, 8)
+_UV_LABELS = ("low", "mod", "high", "very")
+_HUM_LOW, _HUM_HIGH = (40,), (70,)      # 40% 이하 dry, 70% 이상 humid
+_HUM_LABELS = ("dry", "normal", "humid")
+_TEMP_LOW, _TEMP_HIGH = (10,), (28,)    # 10도 이하 cold, 28도 이상 hot
+_TEMP_LABELS = ("cold", "normal", "hot")
+
+# 루틴 슬롯 분류용 한글 태그 집합 (키워드가 들어간 TAG_KO 표기를 미리 모아 둠)
+def _ko_labels_with(*keywords) -> frozenset:
+    return frozenset(v for v in TAG_KO.values() if any(k in v for k in keywords))
+
+
+_SUN_KO = _ko_labels_with("자외선")
+_RETINOL_KO = _ko_labels_with("레티노이드", "탄력", "안티에이징")
+_RELIEF_KO = _ko_labels_with("진정", "시카", "트러블", "티트리")
+_MOIST_KO = _ko_labels_with("보습", "장벽", "건성", "수분")
+
+
+# ==============================================================================
+# 채점 규칙 평탄화 (RULES 중첩 dict -> 조건 x 타깃 정수 점수표, 모듈 로드 시 한 번만 생성)
+# ==============================================================================
+
+# (규칙 그룹, RULES 타깃명) -> (태그들, 성분들, 근거 템플릿 키)
+# 같은 타깃명이라도 그룹마다 보는 태그가 달라서(예: SebumGel) 그룹까지 포함해 키로 사용
+# 근거 키가 None이면 점수만 반영하고 추천 사유에는 표시하지 않음
+_RULE_TARGET_MATCH = {
+    ("humidity", "Rich_Moist"): (RICH_MOIST_TAGS, (), "humid_dry"),
+    ("humidity", "Light_Gel"): (LIGHT_GEL_TAGS, (), "humid_light"),
+    ("temp", "SebumGel"): (HOT_SEBUM_GEL_TAGS, (), "hot_sebum"),
+    ("temp", "BarrierCream"): (BARRIER_CREAM_TAGS, (), "cold_barrier"),
+    ("sebum_high", "SebumGel"): (SEBUM_CARE_TAGS, (), "sebum_care"),
+    ("sebum_high", "Heavy_Oil"): (HEAVY_OIL_TAGS, (), "heavy_oil"),
+    ("acne_high", "BHA_Azelaic"): (ACNE_CARE_TAGS, ACNE_CARE_INGS, "acne_care"),
+    ("redness_high", "SoothingFF"): (SOOTHING_TAGS, SOOTHING_INGS, "soothing"),
+    ("redness_high", "Strong_Acid"): ((), STRONG_ACID_INGS, None),
+    ("redness_high", "High_Retinol"): ((), ("retinol",), None),
+}
+
+# RULES 밖에서 엔진이 직접 주는 가산점: 조건명 -> (태그들, 성분들, 점수, 근거 템플릿 키, 근거 표시 이름)
+_BONUS_RULES = {
+    "pref_gel": (("gel",), (), 5, "pref_texture", "gel"),
+    "pref_cream": (("cream",), (), 5, "pref_texture", "cream"),
+    "age_30plus": (ANTI_AGING_TAGS, ANTI_AGING_INGS, 15, "anti_aging", None),
+    "age_young_oily": (FRESH_TAGS, (), 10, "fresh_care", None),
+}
+
+
+def _compile_rule_table():
+    """
+    RULES와 엔진 가산점을 정수 인덱스 기반 규칙표로 변환합니다. (RULES 부분 평가)
+
+    Returns:
+        tuple: (CONDITION_IDX, TARGET_MATCHERS, RULES_MATRIX, CONDITION_RULES)
+            - CONDITION_IDX: {조건명: 행} ("uv_low", "humidity_dry", "sebum_high", "pref_gel" ...)
+            - TARGET_MATCHERS: [(태그들, 성분들, SPF 선크림 인정 여부)]
+            - RULES_MATRIX[조건, 타깃]: 해당 조건이 발동했을 때 타깃 매칭 제품에 더할 점수 (int16)
+            - CONDITION_RULES: {조건명: ((타깃 번호, 점수, 근거 키, 타깃명), ...)} (RULES 순서 유지, 근거 생성용)
+    """
+    cond_rules = {}   # 조건명 -> [(매처, 점수, 근거 키, 타깃명)]
+    for group, levels in (("uv", _ENV_UV), ("humidity", _ENV_HUM), ("temp", _ENV_TEMP)):
+        for level, targets in levels.items():
+            rules = cond_rules.setdefault(f"{group}_{level}", [])
+            for target, pts in targets.items():
+                if group == "uv":
+                    # 자외선 타깃(spf 등)은 태그 일치 또는 SPF 선크림이면 인정
+                    rules.append((((target.lower(),), (), True), pts, "uv_target", target))
+                elif (group, target) in _RULE_TARGET_MATCH:
+                    tags, ings, ev_key = _RULE_TARGET_MATCH[(group, target)]
+                    rules.append(((tags, ings, False), pts, ev_key, target))
+                # 매핑이 없는 타깃(Occlusive 등)은 채점하지 않음
+    for name, targets in (("sebum_high", _SKIN_SEBUM_HIGH), ("acne_high", _SKIN_ACNE_HIGH),
+                          ("redness_high", _SKIN_REDNESS_HIGH)):
+        rules = cond_rules.setdefault(name, [])
+        for target, pts in targets.items():
+            if (name, target) in _RULE_TARGET_MATCH:
+                tags, ings, ev_key = _RULE_TARGET_MATCH[(name, target)]
+                rules.append(((tags, ings, False), pts, ev_key, target))
+    for name, (tags, ings, pts, ev_key, label) in _BONUS_RULES.items():
+        cond_rules[name] = [((tags, ings, False), pts, ev_key, label)]
+
+    target_idx = {}
+    for rules in cond_rules.values():
+        for matcher, *_ in rules:
+            target_idx.setdefault(matcher, len(target_idx))
+
+    condition_idx = {name: i for i, name in enumerate(cond_rules)}
+    matrix = np.zeros((len(condition_idx), len(target_idx)), dtype=np.int16)
+    condition_rules = {}
+    for name, rules in cond_rules.items():
+        for matcher, pts, _, _ in rules:
+            matrix[condition_idx[name], target_idx[matcher]] += pts
+        condition_rules[name] = tuple(
+            (target_idx[matcher], pts, ev_key, target) for matcher, pts, ev_key, target in rules
+        )
+
+    return condition_idx, tuple(target_idx), matrix, condition_rules
+
+
+CONDITION_IDX, TARGET_MATCHERS, RULES_MATRIX, CONDITION_RULES = _compile_rule_table()
+
+
+# ==============================================================================
+# 추천 근거 문구 템플릿 (채점 중에는 (키, 인자...) 튜플만 쌓고, 노출할 때만 포맷)
+# ==============================================================================
+
+EVIDENCE_TEMPLATES = {
+    "uv_target": "자외선 {} (UV {}) → {} 제품(+{}점)",
+    "humid_dry": "건조한 날씨(습도 {}%) → 고보습 케어(+{}점)",
+    "humid_light": "습한 날씨 → 산뜻한 제형(+{}점)",
+    "hot_sebum": "더운 날씨({}도) → 피지 조절/젤(+{}점)",
+    "cold_barrier": "추운 날씨 → 장벽 보호(+{}점)",
+    "sebum_care": "유분/모공 고민 → 피지 케어(+{}점)",
+    "heavy_oil": "지성 피부 주의 → 오일/밤 감점({}점)",
+    "acne_care": "트러블 지수 높음 → 진정/BHA 성분(+{}점)",
+    "soothing": "민감/홍조 심함 → 시카/진정(+{}점)",
+    "pref_texture": "선호 제형({}) 일치(+5점)",
+    "anti_aging": "30대 피부 관리({}세) → 안티에이징 케어(+15점)",
+    "fresh_care": "20대 피지 관리({}세) → 산뜻한 케어(+10점)",
+    "day_retinol": "현재 시간({}시) → 주간 레티놀 사용 금지(-999점)",
+    "irritant": "민감성 피부 → 자극 성분 제외(-999점)",
+}
+
+
+class ProductMatrix:
+    """
+    [제품 DB 배열화 (SoA)]
+    제품 리스트를 채점용 NumPy 배열로 한 번에 변환합니다.
+    제품마다 파이썬 루프를 돌지 않고, 규칙별로 배열 연산 한 번에 전체 점수를 계산하기 위함입니다.
+
+    - tags_matrix: (제품 수 x 태그 수) uint8 원-핫 행렬
+    - ings_matrix: (제품 수 x 성분 수) uint8 원-핫 행렬
+    - cat_codes: 제품별 카테고리 정수 코드
+    - target_hits(): (제품 수 x 규칙 타깃 수) uint8 매칭 행렬 (처음 호출 시 한 번 계산)
+    """
+
+    def __init__(self, product_db: list):
+        self.products = product_db
+        self._target_hits = None
+
+        # DB 컬럼이 NULL이면 None이 들어오므로 빈 값으로 맞춤 (None이 섞이면 sorted에서 TypeError)
+        tags_list = [p.get("tags") or [] for p in product_db]
+        ings_list = [p.get("featured_ingredients") or [] for p in product_db]
+        cats = [p.get("official_category") or "" for p in product_db]
+
+        tag_vocab = sorted({t for tags in tags_list for t in tags})
+        ing_vocab = sorted({i for ings in ings_list for i in ings})
+        cat_vocab = sorted(set(cats))
+
+        self.tag_idx = {t: i for i, t in enumerate(tag_vocab)}
+        self.ing_idx = {g: i for i, g in enumerate(ing_vocab)}
+        self.cat_idx = {c: i for i, c in enumerate(cat_vocab)}
+
+        n = len(product_db)
+        self.tags_matrix = np.zeros((n, len(tag_vocab)), dtype=np.uint8)
+        self.ings_matrix = np.zeros((n, len(ing_vocab)), dtype=np.uint8)
+        self.cat_codes = np.empty(n, dtype=np.int32)
+
+        for row in range(n):
+            for t in tags_list[row]:
+                self.tags_matrix[row, self.tag_idx[t]] = 1
+            for g in ings_list[row]:
+                self.ings_matrix[row, self.ing_idx[g]] = 1
+            self.cat_codes[row] = self.cat_idx[cats[row]]
+
+    def __len__(self):
+        return len(self.products)
+
+    def has_tag(self, *tags) -> np.ndarray:
+        """주어진 태그 중 하나라도 가진 제품의 마스크 (bool 배열)"""
+        cols = [self.tag_idx[t] for t in tags if t in self.tag_idx]
+        if not cols:
+            return np.zeros(len(self.products), dtype=bool)
+        return self.tags_matrix[:, cols].any(axis=1)
+
+    def has_ing(self, *ings) -> np.ndarray:
+        """주어진 성분 중 하나라도 가진 제품의 마스크 (bool 배열)"""
+        cols = [self.ing_idx[g] for g in ings if g in self.ing_idx]
+        if not cols:
+            return np.zeros(len(self.products), dtype=bool)
+        return self.ings_matrix[:, cols].any(axis=1)
+
+    def is_category(self, cat: str) -> np.ndarray:
+        """특정 카테고리 제품의 마스크 (bool 배열)"""
+        code = self.cat_idx.get(cat)
+        if code is None:
+            return np.zeros(len(self.products), dtype=bool)
+        return self.cat_codes == code
+
+    def target_hits(self) -> np.ndarray:
+        """
+        TARGET_MATCHERS의 각 타깃에 제품이 매칭되는지 여부 행렬을 반환합니다.
+        입력(날씨/피부)과 무관하므로 제품 DB당 한 번만 계산해 보관합니다.
+        """
+        if self._target_hits is None:
+            hits = np.zeros((len(self.products), len(TARGET_MATCHERS)), dtype=np.uint8)
+            spf_sunscreen = self.has_tag("spf") & self.is_category("Sunscreen")
+            for t, (tags, ings, spf_ok) in enumerate(TARGET_MATCHERS):
+                mask = self.has_tag(*tags) | self.has_ing(*ings)
+                if spf_ok:
+                    mask |= spf_sunscreen
+                hits[:, t] = mask
+            self._target_hits = hits
+        return self._target_hits
+
+
+# ==============================================================================
+# 채점 JIT 커널 (numba 선택 설치 - 없으면 NumPy 배열 연산으로 대체)
+# ==============================================================================
+
+def _score_kernel(target_hits, target_pts, ings_mat, veto_cols):
+    """제품 x 타깃 이중 루프로 점수를 누적합니다. (중간 배열 생성 없음)"""
+    n = target_hits.shape[0]
+    n_targets = target_pts.shape[0]
+    scores = np.zeros(n, dtype=np.float64)
+
+    for i in range(n):
+        s = 0.0
+        for t in range(n_targets):
+            if target_pts[t] != 0 and target_hits[i, t] == 1:
+                s += target_pts[t]
+
+        for k in range(veto_cols.shape[0]):
+            if ings_mat[i, veto_cols[k]] == 1:
+                s = -999.0
+                break
+        scores[i] = s
+
+    return scores
+
+
+try:
+    from numba import njit
+except ImportError:
+    _NUMBA_AVAILABLE = False
+else:
+    try:
+        _jit_kernel = njit(cache=True)(_score_kernel)
+
+        # 첫 요청에서 컴파일 지연이 생기지 않도록 import 시점에 더미 입력으로 워밍업
+        _dummy = np.zeros((2, 2), dtype=np.uint8)
+        _jit_kernel(_dummy, np.zeros(2, dtype=np.float64), _dummy, np.zeros(0, dtype=np.int32))
+        _score_kernel = _jit_kernel
+        _NUMBA_AVAILABLE = True
+    except Exception as e:
+        # numba 버전/환경 문제로 컴파일이 실패해도 서버는 NumPy 계산으로 계속 동작
+        logger.warning(f"numba 커널 컴파일 실패, NumPy로 계산합니다: {e}")
+        _NUMBA_AVAILABLE = False
 
 
 class SkinCareAdvisor:
+    # 요청마다 새로 만들어지는 객체라 __dict__ 없이 고정 슬롯만 사용 (메모리/속성 접근 절약)
+    __slots__ = (
+        "cam", "env", "life", "user", "hour", "metrics",
+        "_skin_age", "_env_levels", "_active_skin_targets", "_is_sensitive",
+    )
+
     def __init__(self, payload: dict):
         """
         분석 엔진 초기화
         """
-        self.cam = payload["camera"]        # 센서/AI 분석 데이터
+        # 센서/AI 분석 데이터: 사용하는 항목만 기본값을 채워 float로 한 번에 변환
+        cam = payload["camera"]
+        self.cam = {k: float(cam.get(k, default)) for k, default in _CAM_DEFAULTS.items()}
         self.env = payload["env"]           # 날씨 환경 데이터
         self.life = payload["lifestyle"]    # 생활습관 설문 데이터
         self.user = payload["user"]         # 사용자 기본 정보
@@ -29,6 +331,14 @@ class SkinCareAdvisor:
         # 파생 지표 즉시 계산 (건조도, 민감도 등)
         self.metrics = self._derive_metrics()
 
+        # 피부 나이는 처음 요청될 때 한 번만 계산 (calc_skin_age 참고)
+        self._skin_age = None
+
+        # 제품과 무관한 날씨 등급/활성 규칙은 채점 루프 밖에서 한 번만 계산
+        self._env_levels = self._derive_env_levels()
+        self._active_skin_targets = self._derive_active_skin_targets()
+        self._is_sensitive = self.metrics["sensitivity"] >= 60 or str(self.life.get("sensitivity")).lower() == "yes"
+
     # ==========================================================================
     # 1. 지표 계산 및 진단 (Analysis)
     # ==========================================================================
@@ -38,12 +348,12 @@ class SkinCareAdvisor:
         [내부 함수] 기본 데이터들을 결합하여 복합적인 피부 상태 지표를 계산합니다.
 
         Returns:
-            dict: {sebum, dryness, sensitivity, acne, redness}
+            dict: {sebum, dryness, sensitivity, acne, redness, d_sebum}
         """
-        sebum = float(self.cam.get("sebum", 50))
-        moisture = float(self.cam.get("moisture", 50))
-        redness = float(self.cam.get("redness", 30))
-        acne = float(self.cam.get("acne", 30))
+        sebum = self.cam["sebum"]
+        moisture = self.cam["moisture"]
+        redness = self.cam["redness"]
+        acne = self.cam["acne"]
 
         # 1. 건조도(Dryness): 수분이 낮을수록 높음 + 건조한 날씨면 가산점
         dryness = max(0, 60 - moisture)
@@ -54,26 +364,66 @@ class SkinCareAdvisor:
         is_sensitive_flag = str(self.life.get("sensitivity", "no")).lower() == "yes"
         sensitivity = max(redness, acne, 65 if is_sensitive_flag else 0)
 
+        # 3. 유분/모공 복합 지표: 제품과 무관하므로 채점 전에 한 번만 계산
+        d_sebum = 0.5 * sebum + 0.3 * self.cam["pore"]
+
         return {
             "sebum": sebum,
             "dryness": dryness,
             "sensitivity": sensitivity,
             "acne": acne,
-            "redness": redness
+            "redness": redness,
+            "d_sebum": d_sebum
+        }
+
+    def _derive_env_levels(self) -> dict:
+        """
+        [내부 함수] 날씨 수치를 RULES["env_rules"]의 등급 이름으로 변환합니다.
+
+        Returns:
+            dict: {uv: low/mod/high/very, humidity: dry/normal/humid, temp: cold/normal/hot}
+        """
+        uv_val = self.env["uv"]
+        h_val = self.env["humidity"]
+        t_val = self.env["temperature"]
+        return {
+            "uv": _UV_LABELS[bisect_right(_UV_THRESHOLDS, uv_val)],
+            "humidity": _HUM_LABELS[bisect_left(_HUM_LOW, h_val) + bisect_right(_HUM_HIGH, h_val)],
+            "temp": _TEMP_LABELS[bisect_left(_TEMP_LOW, t_val) + bisect_right(_TEMP_HIGH, t_val)],
         }
 
+    def _derive_active_skin_targets(self) -> dict:
+        """
+        [내부 함수] 현재 피부 상태에서 발동하는 RULES["skin_rules"] 항목만 골라냅니다.
+
+        Returns:
+            dict: {규칙명: {타깃: 점수}} (발동하지 않은 규칙은 제외)
+        """
+        active = {}
+        if self.metrics["d_sebum"] >= 60:
+            active["sebum_high"] = _SKIN_SEBUM_HIGH
+        if self.metrics["acne"] >= 60:
+            active["acne_high"] = _SKIN_ACNE_HIGH
+        if self.metrics["sensitivity"] >= 60:
+            active["redness_high"] = _SKIN_REDNESS_HIGH
+        return active
+
     def calc_skin_age(self) -> float:
         """
         [피부 나이 추정] 결점(주름, 모공 등)이 많을수록 실제 나이보다 높게 측정됩니다.
+        입력이 바뀌지 않으므로 첫 호출 결과를 인스턴스에 저장해 재사용합니다.
 
         Returns:
             float: 추정된 피부 나이
         """
+        if self._skin_age is not None:
+            return self._skin_age
+
         # 주요 결점 지표
-        wrinkle = float(self.cam.get("wrinkle", 40))
-        pore = float(self.cam.get("pore", 50))
-        pigm = float(self.cam.get("pigmentation", 40))
-        tone = float(self.cam.get("tone", 50))
+        wrinkle = self.cam["wrinkle"]
+        pore = self.cam["pore"]
+        pigm = self.cam["pigmentation"]
+        tone = self.cam["tone"]
 
         # 노화 점수 계산 (주름 가중치가 가장 높음)
         aging_score = (
@@ -91,170 +441,139 @@ class SkinCareAdvisor:
         delta = 0.12 * (aging_score - 50)
 
         # 최소 15세, 최대 80세로 제한
-        return round(min(80, max(15, user_age + delta)), 1)
+        self._skin_age = round(min(80, max(15, user_age + delta)), 1)
+        return self._skin_age
 
     # ==========================================================================
     # 2. 제품 추천 엔진 (Scoring Engine)
     # ==========================================================================
 
-    def recommend_products(self, product_db: list) -> dict:
-        scored_list = []
-        for p in product_db:
-            score, detail, evidences = self._score_single_product(p)
-            if score > 0:
-                scored_list.append({
-                    "product": p, "score": round(score, 2),
-                    "detail": detail, "evidences": evidences
-                })
-
-        # 점수순 정렬
-        scored_list.sort(key=lambda x: x["score"], reverse=True)
+    def recommend_products(self, product_db) -> dict:
+        """
+        [제품 추천] 전체 제품을 배열 연산으로 한 번에 채점한 뒤,
+        카테고리별 1등 위주로 Top 3를 구성합니다.
+        (추천 사유 문구는 최종 선정된 3개 제품에 대해서만 생성합니다.)
 
-        # [알고리즘 수정] 카테고리별로 1등만 뽑아서 Top 3 구성하기
-        final_top3 = []
-        seen_categories = set()
+        Args:
+            product_db: 제품 리스트 또는 미리 변환해 둔 ProductMatrix
+        """
+        pm = product_db if isinstance(product_db, ProductMatrix) else ProductMatrix(product_db)
+        scores = self._score_all_products(pm)
 
-        for item in scored_list:
-            cat = item["product"]["official_category"]
-            # 이미 뽑은 카테고리라면 패스 (단, Top 3가 안 찼으면 계속)
-            if cat not in seen_categories:
-                final_top3.append(item)
-                seen_categories.add(cat)
+        # 0점 이하 제외. 전체 정렬 대신 상위 몇 개만 뽑음 (동점이면 원래 순서 우선)
+        positive = np.flatnonzero(scores > 0)
+        rank_key = lambda i: (scores[i], -i)
 
-            if len(final_top3) >= 3:
-                break
+        # [알고리즘 수정] 카테고리별로 1등만 뽑아서 Top 3 구성하기
+        # 카테고리별 최고점 제품(동점이면 앞선 제품)을 먼저 구한 뒤, 그중 상위 3개만 선택
+        cats = pm.cat_codes[positive]
+        best = np.full(len(pm.cat_idx), -np.inf)
+        np.maximum.at(best, cats, scores[positive])
+        cand = positive[scores[positive] == best[cats]]
+        _, first = np.unique(pm.cat_codes[cand], return_index=True)
+        final_idx = heapq.nlargest(3, cand[first].tolist(), key=rank_key)
 
         # 만약 카테고리가 너무 겹쳐서 3개를 못 채웠으면 나머지도 채움
-        if len(final_top3) < 3:
-            for item in scored_list:
-                if item not in final_top3:
-                    final_top3.append(item)
-                    if len(final_top3) >= 3: break
+        if len(final_idx) < 3:
+            for i in heapq.nlargest(3, positive.tolist(), key=rank_key):
+                if i not in final_idx:
+                    final_idx.append(i)
+                    if len(final_idx) >= 3: break
+
+        # 선정된 제품만 규칙을 다시 따라가며 추천 근거(evidences) 생성
+        final_top3 = []
+        for i in final_idx:
+            p = pm.products[i]
+            _, evidences = self._score_single_product(p)
+            final_top3.append({
+                "product": p, "score": round(float(scores[i]), 2),
+                "evidences": evidences
+            })
 
         return {
             "top3": [self._format_product_result(item, i + 1) for i, item in enumerate(final_top3)],
             "reasons": self._summarize_reasons(final_top3)
         }
 
-    def _score_single_product(self, p: dict):
+    def _active_conditions(self) -> list:
         """
-        [채점 로직] config.py의 RULES를 기반으로 제품의 점수를 계산합니다.
+        [내부 함수] 현재 입력에서 발동하는 채점 조건명(CONDITION_IDX 키) 목록을 반환합니다.
         """
-        score = 0.0
-        detail = {}
-        evidences = []
+        conds = [f"uv_{self._env_levels['uv']}", f"humidity_{self._env_levels['humidity']}",
+                 f"temp_{self._env_levels['temp']}"]
+        conds.extend(self._active_skin_targets)
 
-        tags = set(p.get("tags", []))
-        ings = set(p.get("featured_ingredients", []))
-        cat = p.get("official_category", "")
-
-        # ---------------------------------------------------------
-        # [A] 환경 점수 (Environment Rules)
-        # ---------------------------------------------------------
-        env_rules = RULES["env_rules"]
+        pref = self.user.get("pref_texture", "gel")
+        if pref in ("gel", "cream"):
+            conds.append(f"pref_{pref}")
 
-        # 1. 자외선 (UV)
-        uv_val = self.env["uv"]
-        uv_level = "very" if uv_val >= 8 else ("high" if uv_val >= 6 else ("mod" if uv_val >= 3 else "low"))
+        user_age = self.user.get("age", 25)
+        if user_age >= 30:
+            conds.append("age_30plus")
+        elif user_age <= 24 and self.metrics["sebum"] > 50:
+            conds.append("age_young_oily")
 
-        uv_targets = env_rules["uv"].get(uv_level, {})
-        for target, pts in uv_targets.items():
-            # SPF30/50 -> spf 태그 확인
-            if (target.lower() in tags) or ("spf" in tags and cat == "Sunscreen"):
-                score += pts
-                evidences.append(f"자외선 {uv_level} (UV {uv_val}) → {target} 제품(+{pts}점)")
+        return [c for c in conds if c in CONDITION_IDX]
 
-        # 2. 습도 (Humidity)
-        h_val = self.env["humidity"]
-        humid_level = "dry" if h_val <= 40 else ("humid" if h_val >= 70 else "normal")
-
-        humid_targets = env_rules["humidity"].get(humid_level, {})
-        for target, pts in humid_targets.items():
-            # 매핑: Rich_Moist -> moisturizing/rich 등
-            if target == "Rich_Moist" and any(t in tags for t in ["moisturizing", "rich", "cream"]):
-                score += pts
-                evidences.append(f"건조한 날씨(습도 {h_val}%) → 고보습 케어(+{pts}점)")
-            elif target == "Light_Gel" and any(t in tags for t in ["light", "gel", "watery"]):
-                score += pts
-                evidences.append(f"습한 날씨 → 산뜻한 제형(+{pts}점)")
-
-        # 3. 기온 (Temperature)
-        t_val = self.env["temperature"]
-        temp_level = "hot" if t_val >= 28 else ("cold" if t_val <= 10 else "normal")
+    def _veto_ings(self) -> set:
+        """[내부 함수] 안전 규칙: 해당 성분이 있으면 즉시 탈락(-999)시킬 성분 집합"""
+        veto = set()
+        if 6 <= self.hour < 18:
+            veto.add("retinol")
+        if self._is_sensitive:
+            veto |= IRRITANT_INGS
+        return veto
 
-        temp_targets = env_rules["temp"].get(temp_level, {})
-        for target, pts in temp_targets.items():
-            if target == "SebumGel" and any(t in tags for t in ["sebum-care", "pore-care", "gel"]):
-                score += pts
-                evidences.append(f"더운 날씨({t_val}도) → 피지 조절/젤(+{pts}점)")
-            elif target == "BarrierCream" and any(t in tags for t in ["barrier", "ceramide", "cream"]):
-                score += pts
-                evidences.append(f"추운 날씨 → 장벽 보호(+{pts}점)")
+    def _score_all_products(self, pm: ProductMatrix) -> np.ndarray:
+        """
+        [벡터화 채점] _score_single_product와 동일한 규칙을 전체 제품에 한 번에 적용합니다.
+        발동한 조건의 RULES_MATRIX 행을 합쳐 타깃별 점수 벡터를 만들고,
+        제품 x 타깃 매칭 행렬(pm.target_hits)과 곱해 전체 점수를 구합니다.
+        numba가 있으면 JIT 커널(_score_kernel), 없으면 NumPy 행렬 곱으로 계산합니다.
 
-        # ---------------------------------------------------------
-        # [B] 피부 상태 점수 (Skin Rules)
-        # ---------------------------------------------------------
-        skin_rules = RULES["skin_rules"]
+        Returns:
+            np.ndarray: 제품별 점수 (float64)
+        """
+        rows = [CONDITION_IDX[c] for c in self._active_conditions()]
+        target_pts = RULES_MATRIX[rows].sum(axis=0, dtype=np.float64)
+        veto_ings = self._veto_ings()
+        hits = pm.target_hits()
 
-        # 1. 유분 과다 (Sebum High)
-        d_sebum = (0.5 * self.metrics["sebum"] + 0.3 * float(self.cam.get("pore", 50)))
-        if d_sebum >= 60:
-            targets = skin_rules["sebum_high"]
-            for target, pts in targets.items():
-                if target == "SebumGel" and any(t in tags for t in ["sebum-care", "oily-skin"]):
-                    score += pts
-                    evidences.append(f"유분/모공 고민 → 피지 케어(+{pts}점)")
-                elif target == "Heavy_Oil" and ("oil" in tags or "balm" in tags):
-                    score += pts  # 감점
-                    evidences.append(f"지성 피부 주의 → 오일/밤 감점({pts}점)")
+        if _NUMBA_AVAILABLE:
+            veto_cols = np.array([pm.ing_idx[g] for g in veto_ings if g in pm.ing_idx], dtype=np.int32)
+            return _score_kernel(hits, target_pts, pm.ings_matrix, veto_cols)
 
-        # 2. 트러블 (Acne High)
-        if self.metrics["acne"] >= 60:
-            targets = skin_rules["acne_high"]
-            for target, pts in targets.items():
-                if target == "BHA_Azelaic" and (any(t in tags for t in ["acne-care"]) or any(i in ings for i in ["bha", "azelaic", "teatree"])):
-                    score += pts
-                    evidences.append(f"트러블 지수 높음 → 진정/BHA 성분(+{pts}점)")
+        scores = hits @ target_pts
+        if veto_ings:
+            scores[pm.has_ing(*veto_ings)] = -999
 
-        # 3. 민감성/홍조 (Redness High)
-        if self.metrics["sensitivity"] >= 60:
-            targets = skin_rules["redness_high"]
-            for target, pts in targets.items():
-                if target == "SoothingFF" and (any(t in tags for t in ["soothing"]) or any(i in ings for i in ["cica", "mugwort", "heartleaf"])):
-                    score += pts
-                    evidences.append(f"민감/홍조 심함 → 시카/진정(+{pts}점)")
+        return scores
 
-                # 감점 요인 (강한 자극 성분)
-                if target == "Strong_Acid" and (any(i in ings for i in ["aha", "bha"])):
-                    score += pts
-                if target == "High_Retinol" and ("retinol" in ings):
-                    score += pts
+    def _score_single_product(self, p: dict):
+        """
+        [채점 로직] 제품 1개의 점수와 추천 근거를 계산합니다.
+        (전체 채점은 _score_all_products가 담당하고, 여기서는 최종 선정 제품의 근거를 모읍니다.)
+        발동한 조건의 CONDITION_RULES를 RULES 순서대로 따라가므로 문자열 타깃 분기가 없습니다.
+        근거는 (템플릿 키, 인자...) 튜플로만 기록하고, 문자열 포맷은 _render_evidence에서 합니다.
+        """
+        score = 0.0
+        evidences = []
 
-        # ---------------------------------------------------------
-        # [C] 사용자 선호도 (User Preferences)
-        # ---------------------------------------------------------
-        pref = self.user.get("pref_texture", "gel")
-        if (pref == "gel" and "gel" in tags) or (pref == "cream" and "cream" in tags):
-            score += 5
-            evidences.append(f"선호 제형({pref}) 일치(+5점)")
+        # 로더에서 미리 만들어 둔 frozenset 사용 (없으면 즉석 생성)
+        tags = p["_tag_set"] if "_tag_set" in p else frozenset(p.get("tags") or [])
+        ings = p["_ing_set"] if "_ing_set" in p else frozenset(p.get("featured_ingredients") or [])
+        spf_sunscreen = "spf" in tags and p.get("official_category") == "Sunscreen"
 
         # ---------------------------------------------------------
-        # [D] 나이 기반 가산점 (Age Bonus)
+        # [A]~[D] 환경 / 피부 상태 / 선호도 / 나이 규칙
         # ---------------------------------------------------------
-        user_age = self.user.get("age", 25)
-
-        # 30대 이상이면 '탄력/주름/레티놀' 제품에 가산점 부여
-        if user_age >= 30:
-            if any(t in tags for t in ["anti-aging", "firming", "rich"]) or any(i in ings for i in ["retinol", "collagen"]):
-                score += 15
-                evidences.append(f"30대 피부 관리({user_age}세) → 안티에이징 케어(+15점)")
-
-        # 20대 초반이고 지성이면 '산뜻한' 제품에 가산점
-        elif user_age <= 24 and self.metrics["sebum"] > 50:
-            if any(t in tags for t in ["light", "fresh", "pore-care"]):
-                score += 10
-                evidences.append(f"20대 피지 관리({user_age}세) → 산뜻한 케어(+10점)")
-
+        for cond in self._active_conditions():
+            for target_no, pts, ev_key, target in CONDITION_RULES[cond]:
+                t_tags, t_ings, spf_ok = TARGET_MATCHERS[target_no]
+                if (spf_ok and spf_sunscreen) or not tags.isdisjoint(t_tags) or not ings.isdisjoint(t_ings):
+                    score += pts
+                    if ev_key:
+                        evidences.append(self._evidence(ev_key, target, pts))
 
         # ---------------------------------------------------------
         # [E] 안전 규칙 (Safety Rules)
@@ -265,18 +584,30 @@ class SkinCareAdvisor:
         if 6 <= self.hour < 18:
             if "retinol" in ings:
                 score = -999  # 추천 목록에서 즉시 탈락시킴
-                evidences.append(f"현재 시간({self.hour}시) → 주간 레티놀 사용 금지(-999점)")
+                evidences.append(("day_retinol", self.hour))
 
         # 2. 민감성 피부 강한 성분 금지 (final_skin.py 로직 반영)
-        is_sensitive = self.metrics["sensitivity"] >= 60 or str(self.life.get("sensitivity")).lower() == "yes"
-        if is_sensitive:
+        if self._is_sensitive:
             # 고농도 비타민C(Ascorbic Acid), 강한 산(AHA/BHA) 등 자극 성분 체크
-            # config.py의 blacklist 활용 가능하지만, 여기서는 직관적으로 태그 체크
-            if any(i in ings for i in ["aha", "bha", "retinol"]):
+            if not IRRITANT_INGS.isdisjoint(ings):
                 score = -999
-                evidences.append("민감성 피부 → 자극 성분 제외(-999점)")
-
-        return score, detail, evidences
+                evidences.append(("irritant",))
+
+        return score, evidences
+
+    def _evidence(self, ev_key: str, target: str, pts) -> tuple:
+        """규칙별 근거 튜플 생성 (EVIDENCE_TEMPLATES 인자 순서에 맞춤)"""
+        if ev_key == "uv_target":
+            return ev_key, self._env_levels["uv"], self.env["uv"], target, pts
+        if ev_key == "humid_dry":
+            return ev_key, self.env["humidity"], pts
+        if ev_key == "hot_sebum":
+            return ev_key, self.env["temperature"], pts
+        if ev_key == "pref_texture":
+            return ev_key, target
+        if ev_key in ("anti_aging", "fresh_care"):
+            return ev_key, self.user.get("age", 25)
+        return ev_key, pts
 
     # ==========================================================================
     # 3. 결과 포매팅 및 루틴 생성 (Formatting & Routine)
@@ -291,10 +622,15 @@ class SkinCareAdvisor:
             "brand": p["brand"],
             "category": CAT_KO.get(p["official_category"], p["official_category"]),
             "score": item["score"],
-            "tags": [TAG_KO.get(t, t) for t in p.get("tags", [])[:4]],
-            "reasons": item["evidences"][:3]  # 핵심 이유 3가지만 노출
+            "tags": [TAG_KO.get(t, t) for t in (p.get("tags") or [])[:4]],
+            "reasons": [self._render_evidence(e) for e in item["evidences"][:3]]  # 핵심 이유 3가지만 노출
         }
 
+    @staticmethod
+    def _render_evidence(key: tuple) -> str:
+        """근거 튜플 (템플릿 키, 인자...)을 화면용 문구로 변환"""
+        return EVIDENCE_TEMPLATES[key[0]].format(*key[1:])
+
     def _summarize_reasons(self, top3):
         """추천 사유 요약 (AI 코멘트용)"""
         reasons = []
@@ -311,7 +647,7 @@ class SkinCareAdvisor:
         단순 나열이 아닌 '상황별 맞춤 행동 지침'을 제공합니다.
         """
         # 1. 상황 판단 플래그 (Context Flags)
-        is_sensitive = self.metrics["sensitivity"] >= 60 or str(self.life.get("sensitivity")).lower() == "yes"
+        is_sensitive = self._is_sensitive
         high_dry = self.metrics["dryness"] >= 60
         high_acne = self.metrics["acne"] >= 60
         high_uv = self.env["uv"] >= 6
@@ -324,34 +660,21 @@ class SkinCareAdvisor:
 
         for item in top3_products:
             name = f"**{item['name']}**"
-            cat = item["category"]
-            tags = item.get("tags", []) # 이미 TAG_KO로 변환된 한글 태그일 수 있음. 주의.
-            # _format_product_result에서 tags를 한글로 변환해서 리턴함.
-            # 하지만 top3_products는 _format_product_result의 결과물임.
-            # 따라서 여기서 tags는 ["진정", "보습"] 같은 한글 리스트임.
-            # 로직을 한글 태그 기준으로 바꾸거나, 원본 데이터를 넘겨야 함.
-            # recommend_products에서 top3를 만들 때 _format_product_result를 호출함.
-            # generate_routine_text는 그 결과를 받음.
-            # 따라서 여기서는 한글 태그를 체크해야 함!
-            # 혹은 recommend_products에서 원본 product 객체를 같이 넘겨주는 게 좋음.
-            # 하지만 지금 구조상 top3_products는 이미 포맷팅된 dict임.
-            
-            # 임시 해결: 한글 태그 텍스트로 체크 (TAG_KO 역매핑은 복잡함)
-            # "진정" -> soothing, "보습" -> moisturizing
-            
-            tags_str = str(tags)
+            cat = item["category"] or ""  # 카테고리가 NULL인 제품도 있음
+            # top3_products는 _format_product_result 결과라 tags가 ["진정", "보습"] 같은 한글 표기임
+            tags = item.get("tags", [])
 
             # 선크림
-            if "Sunscreen" in cat or "자외선" in tags_str:
+            if "Sunscreen" in cat or not _SUN_KO.isdisjoint(tags):
                 if not slots["sun"]: slots["sun"] = name
             # 레티놀 (밤 전용)
-            elif "레티노이드" in tags_str or "탄력" in tags_str or "안티에이징" in tags_str:
+            elif not _RETINOL_KO.isdisjoint(tags):
                 if not slots["retinol"]: slots["retinol"] = name
             # 진정/트러블
-            elif any(x in tags_str for x in ["진정", "시카", "트러블", "티트리"]):
+            elif not _RELIEF_KO.isdisjoint(tags):
                 if not slots["relief"]: slots["relief"] = name
             # 보습
-            elif any(x in tags_str for x in ["보습", "장벽", "건성", "수분"]):
+            elif not _MOIST_KO.isdisjoint(tags):
                 if not slots["moist"]: slots["moist"] = name
 
         # ---------------------------------------------------------
@@ -6,16 +6,19 @@
 3. GPT Vision API (피부 상세 분석)
 """
 
+import asyncio
+import io
 import logging
+import threading
 import uuid
-import shutil
 import os
 import time
 from typing import Optional
 from fastapi import UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
 
 # 1. DB 저장 (Repository)
-from core.utils import save_analysis_log_db
+from core.utils import save_analysis_log_db, check_user_exists_db
 
 # 2. GPT 분석 (External API)
 from .gpt_api import analyze_skin_image
@@ -29,74 +32,102 @@ logger = logging.getLogger(__name__)
 # 1. 하드웨어 센서 제어 (수분/유분) - HW팀 로직 적용
 # ==============================================================================
 
-def read_hardware_sensors():
-    """
-    [환경 자동 감지]
-    Skin.py 로직을 적용: 5초 평균 측정 -> 캘리브레이션 값 반환
-    """
-    try:
+# SPI 장치는 처음 측정할 때 한 번만 열고 이후 요청에서 재사용합니다. (서버 종료 시 close_sensors로 해제)
+# 요청이 스레드풀에서 동시에 들어올 수 있으므로 측정은 Lock으로 한 번에 하나씩만 진행
+_SPI = None
+_SPI_LOCK = threading.Lock()
+
+
+def _get_spi():
+    """[내부 함수] 열려 있는 SpiDev 객체를 반환합니다. (없으면 열고 설정)"""
+    global _SPI
+    if _SPI is None:
         import spidev
         # RPi.GPIO는 설치 확인용
         import RPi.GPIO as GPIO
 
-        # --- [HW팀 설정 상수] ---
-        WATER_MIN, WATER_MAX = 0, 150
-        OIL_MIN, OIL_MAX = 300, 1200
-
-        MEASUREMENT_DURATION = 5  # 5초 측정
-        SAMPLING_INTERVAL = 0.1
-
-        # SPI 초기화
         spi = spidev.SpiDev()
         spi.open(0, 0)
         spi.max_speed_hz = 1350000
+        _SPI = spi
+    return _SPI
 
-        def read_adc(channel):
-            command = [1, (8 + channel) << 4, 0]
-            r = spi.xfer2(command)
-            return ((r[1] & 3) << 8) + r[2]
 
-        def map_value(value, min_val, max_val):
-            value = max(min_val, min(value, max_val))
-            return (value - min_val) / (max_val - min_val) * 100
+def close_sensors():
+    """열어 둔 SPI 장치를 닫습니다. (서버 종료 시 호출)"""
+    global _SPI
+    with _SPI_LOCK:
+        if _SPI is not None:
+            try:
+                _SPI.close()
+            except Exception as e:
+                logger.warning(f"SPI 닫기 실패: {e}")
+            _SPI = None
 
-        # 측정 시작
-        water_readings = []
-        oil_readings = []
-        start_time = time.time()
 
-        logger.info(f"💧 센서 측정 시작 ({MEASUREMENT_DURATION}초)...")
+def read_hardware_sensors():
+    """
+    [환경 자동 감지]
+    Skin.py 로직을 적용: 5초 평균 측정 -> 캘리브레이션 값 반환
+    """
+    global _SPI
+    with _SPI_LOCK:
+        try:
+            spi = _get_spi()
 
-        while (time.time() - start_time) < MEASUREMENT_DURATION:
-            water_readings.append(read_adc(0))
-            oil_readings.append(read_adc(1))
-            time.sleep(SAMPLING_INTERVAL)
+            # --- [HW팀 설정 상수] ---
+            WATER_MIN, WATER_MAX = 0, 150
+            OIL_MIN, OIL_MAX = 300, 1200
 
-        spi.close()
+            MEASUREMENT_DURATION = 5  # 5초 측정
+            SAMPLING_INTERVAL = 0.1
 
-        real_moisture = 0
-        real_sebum = 0
+            def read_adc(channel):
+                command = [1, (8 + channel) << 4, 0]
+                r = spi.xfer2(command)
+                return ((r[1] & 3) << 8) + r[2]
 
-        if len(water_readings) > 0:
-            avg_water = sum(water_readings) / len(water_readings)
-            avg_oil = sum(oil_readings) / len(oil_readings)
-            real_moisture = map_value(avg_water, WATER_MIN, WATER_MAX)
-            real_sebum = map_value(avg_oil, OIL_MIN, OIL_MAX)
+            def map_value(value, min_val, max_val):
+                value = max(min_val, min(value, max_val))
+                return (value - min_val) / (max_val - min_val) * 100
 
-        logger.info(f"측정 완료 - 수분: {real_moisture:.1f}%, 유분: {real_sebum:.1f}%")
-        return {"moisture": int(real_moisture), "sebum": int(real_sebum)}
+            # 측정 시작
+            water_readings = []
+            oil_readings = []
+            start_time = time.time()
 
-    except ImportError:
-        logger.warning("spidev 없음: PC 테스트 모드")
-        # 테스트용 임시 값
-        return {"moisture": 50, "sebum": 50}
-    except Exception as e:
-        logger.error(f"센서 오류: {e}")
-        try:
-            if 'spi' in locals(): spi.close()
-        except:
-            pass
-        raise Exception(f"센서 측정 실패: {str(e)}")
+            logger.info(f"💧 센서 측정 시작 ({MEASUREMENT_DURATION}초)...")
+
+            while (time.time() - start_time) < MEASUREMENT_DURATION:
+                water_readings.append(read_adc(0))
+                oil_readings.append(read_adc(1))
+                time.sleep(SAMPLING_INTERVAL)
+
+            real_moisture = 0
+            real_sebum = 0
+
+            if len(water_readings) > 0:
+                avg_water = sum(water_readings) / len(water_readings)
+                avg_oil = sum(oil_readings) / len(oil_readings)
+                real_moisture = map_value(avg_water, WATER_MIN, WATER_MAX)
+                real_sebum = map_value(avg_oil, OIL_MIN, OIL_MAX)
+
+            logger.info(f"측정 완료 - 수분: {real_moisture:.1f}%, 유분: {real_sebum:.1f}%")
+            return {"moisture": int(real_moisture), "sebum": int(real_sebum)}
+
+        except ImportError:
+            logger.warning("spidev 없음: PC 테스트 모드")
+            # 테스트용 임시 값
+            return {"moisture": 50, "sebum": 50}
+        except Exception as e:
+            logger.error(f"센서 오류: {e}")
+            # 장치 상태가 이상할 수 있으므로 닫고 다음 측정 때 다시 열기
+            try:
+                if _SPI is not None: _SPI.close()
+            except:
+                pass
+            _SPI = None
+            raise Exception(f"센서 측정 실패: {str(e)}")
 
 
 # ==============================================================================
@@ -113,62 +144,117 @@ ROOT_DIR = os.path.dirname(SERVICES_DIR)
 # 3. 루트 경로와 폴더명을 합침 -> .../SkinProject/temp_uploads (무조건 여기로 고정됨)
 DEFAULT_SAVE_DIR = os.path.join(ROOT_DIR, "temp_uploads")
 
-def capture_image_from_camera(save_dir="temp_uploads"):
-    """
-    [Picamera2 제어]
-    라즈베리파이 카메라로 사진을 찍어 저장 경로를 반환합니다.
-    """
-    if not os.path.exists(save_dir):
-        os.makedirs(save_dir)
-
-    # 파일명 랜덤 생성 (중복 방지)
-    filename = f"cam_{uuid.uuid4()}.jpg"
-    filepath = os.path.join(save_dir, filename)
+# 카메라는 처음 촬영할 때 한 번만 켜고(설정 + 2초 안정화) 이후 요청에서 계속 재사용합니다.
+# (매 촬영마다 연결/설정/안정화 대기를 반복하지 않음, 서버 종료 시 close_camera로 해제)
+_CAMERA = None
+_CAMERA_LOCK = threading.Lock()
 
-    picam2 = None  # 변수 초기화
 
-    try:
+def _get_camera():
+    """[내부 함수] 켜져 있는 Picamera2 객체를 반환합니다. (없으면 연결/설정 후 시작)"""
+    global _CAMERA
+    if _CAMERA is None:
         from picamera2 import Picamera2
 
-        logger.info("📸 [Pi] Picamera2로 촬영을 시도합니다...")
         picam2 = Picamera2()  # 카메라 연결
+        try:
+            # 카메라를 켜 둔 채로 재사용하므로 버퍼는 1개만 두고 미리 찍어 둔 프레임을 쌓지 않음
+            # (queue=False: 촬영 요청 이후에 들어온 프레임으로 찍어 오래된 화면이 나오지 않게 함)
+            config = picam2.create_still_configuration(main={"size": (640, 480)}, buffer_count=1, queue=False)
+            picam2.configure(config)
+
+            picam2.start()
+
+            picam2.set_controls({
+                "Brightness": 0.3,  # 밝기를 30% 증가
+                "AnalogueGain": 2.0  # 빛 감지 감도를 2배로 증가 (어두운 곳에서 효과적)
+
+            })
+            time.sleep(2)  # 안정화 (카메라를 켤 때 한 번만)
+        except Exception:
+            picam2.close()
+            raise
+        _CAMERA = picam2
+    return _CAMERA
+
+
+def close_camera():
+    """켜 둔 카메라 자원을 해제합니다. (서버 종료 시 호출)"""
+    global _CAMERA
+    with _CAMERA_LOCK:
+        if _CAMERA is not None:
+            try:
+                _CAMERA.stop()
+                _CAMERA.close()
+                logger.info("🔒 카메라 자원 해제 완료")
+            except Exception as e:
+                logger.warning(f"카메라 닫기 실패(이미 닫힘 등): {e}")
+            _CAMERA = None
 
-        config = picam2.create_still_configuration(main={"size": (640, 480)})
-        picam2.configure(config)
 
-        picam2.start()
+def capture_jpeg_from_camera() -> bytes:
+    """
+    [Picamera2 제어]
+    라즈베리파이 카메라로 사진을 찍어 JPEG bytes로 반환합니다. (파일로 저장하지 않음)
+    촬영에 실패하면 None을 반환합니다.
+    """
+    global _CAMERA
+    with _CAMERA_LOCK:
+        try:
+            logger.info("📸 [Pi] Picamera2로 촬영을 시도합니다...")
+            buffer = io.BytesIO()
+            _get_camera().capture_file(buffer, format="jpeg")
 
-        picam2.set_controls({
-            "Brightness": 0.3,  # 밝기를 30% 증가
-            "AnalogueGain": 2.0  # 빛 감지 감도를 2배로 증가 (어두운 곳에서 효과적)
+            logger.info("✅ [Pi] 촬영 완료")
+            return buffer.getvalue()
 
-        })
-        time.sleep(2)  # 안정화
-        picam2.capture_file(filepath)
-        picam2.stop()
+        except ImportError:
+            logger.warning("⚠️ Picamera2 모듈 없음. PC 환경으로 간주합니다.")
+        except Exception as e:
+            logger.error(f"❌ Picamera2 에러: {e}")
+            # 카메라 상태가 이상할 수 있으므로 닫고 다음 촬영 때 다시 연결
+            if _CAMERA is not None:
+                try:
+                    _CAMERA.close()
+                except Exception as close_error:
+                    logger.warning(f"카메라 닫기 실패(이미 닫힘 등): {close_error}")
+                _CAMERA = None
+        return None
+
+
+def capture_image_from_camera(save_dir=DEFAULT_SAVE_DIR):
+    """
+    [Picamera2 제어]
+    라즈베리파이 카메라로 사진을 찍어 저장 경로를 반환합니다.
+    """
+    image_bytes = capture_jpeg_from_camera()
+    if image_bytes is None:
+        return None
 
-        logger.info(f"✅ [Pi] 촬영 완료: {filepath}")
-        return filepath
+    if not os.path.exists(save_dir):
+        os.makedirs(save_dir)
 
-    except ImportError:
-        logger.warning("⚠️ Picamera2 모듈 없음. PC 환경으로 간주합니다.")
-    except Exception as e:
-        logger.error(f"❌ Picamera2 에러: {e}")
-        # 여기서 에러가 나도 아래 finally에서 닫아줍니다.
-    finally:
-        # [핵심 수정] 카메라가 켜져 있다면 무조건 닫아서 자원을 반환함
-        if picam2 is not None:
-            try:
-                picam2.close()
-                logger.info("🔒 카메라 자원 해제 완료")
-            except Exception as e:
-                logger.warning(f"카메라 닫기 실패(이미 닫힘 등): {e}")
+    # 파일명 랜덤 생성 (중복 방지)
+    filename = f"cam_{uuid.uuid4()}.jpg"
+    filepath = os.path.join(save_dir, filename)
+    save_image_bytes(image_bytes, filepath)
+    return filepath
 
 
 # ==============================================================================
 # 3. 통합 분석 프로세스 (Main Process)
 # ==============================================================================
 
+def save_image_bytes(image_bytes: bytes, file_path: str):
+    """
+    메모리에 받아 둔 업로드 이미지를 디스크에 저장합니다. (히스토리 화면 표시용)
+    (동기 함수이므로 async 함수에서는 run_in_threadpool로 호출)
+    """
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "wb") as buffer:
+        buffer.write(image_bytes)
+
+
 async def process_skin_analysis(
         user_id: str,
         file: Optional[UploadFile] = None,
@@ -181,8 +267,17 @@ async def process_skin_analysis(
     2. 이미지 확보 (업로드 파일 or 카메라 촬영)
     3. GPT API 호출
     4. DB 저장
+
+    센서/카메라/GPT/DB 호출은 모두 동기(블로킹) 함수이므로 스레드풀에서 실행해
+    분석 중에도 이벤트 루프가 다른 요청을 처리할 수 있게 합니다.
     """
 
+    # -------------------------------------------------------
+    # [Step 0] 회원 확인 (센서 측정/이미지 저장/GPT 호출 전에 먼저 거름)
+    # -------------------------------------------------------
+    if not await run_in_threadpool(check_user_exists_db, user_id):
+        raise HTTPException(status_code=401, detail="존재하지 않는 회원입니다.")
+
     # -------------------------------------------------------
     # [Step 1] 센서 데이터 확보 (수분/유분)
     # -------------------------------------------------------
@@ -191,7 +286,7 @@ async def process_skin_analysis(
     if moisture is None or sebum is None:
         try:
             # HW 센서값 읽기 (5초 소요)
-            sensor_data = read_hardware_sensors()
+            sensor_data = await run_in_threadpool(read_hardware_sensors)
             if moisture is None: moisture = sensor_data["moisture"]
             if sebum is None: sebum = sensor_data["sebum"]
             sensor_source = "hardware_sensor"
@@ -204,33 +299,39 @@ async def process_skin_analysis(
     # -------------------------------------------------------
     # [Step 2] 이미지 파일 확보
     # -------------------------------------------------------
-    file_path = ""
-
     # A. 앱에서 파일 업로드 됨
+    # (메모리로 한 번만 읽어 GPT에 바로 보내고, 히스토리용 파일 저장은 GPT 분석과 동시에 진행)
     if file is not None:
         filename = f"{uuid.uuid4()}.jpg"
-        file_path = f"temp_uploads/{filename}"
-        try:
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail="이미지 파일 저장 실패")
+        image_bytes = await file.read()
 
-    # B. 파일 없음 -> 카메라 촬영 시도
+    # B. 파일 없음 -> 카메라 촬영 시도 (업로드와 같이 bytes로 받아 GPT에 바로 전달)
     else:
         logger.info("업로드된 파일 없음 -> 카메라 촬영 시도")
-        try:
-            # Picamera2 촬영 (3초 소요)
-            file_path = capture_image_from_camera()
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"카메라 촬영 실패: {str(e)}")
+        image_bytes = await run_in_threadpool(capture_jpeg_from_camera)
+        if image_bytes is None:
+            raise HTTPException(status_code=500, detail="카메라 촬영 실패")
+        filename = f"cam_{uuid.uuid4()}.jpg"
+
+    # 디스크에는 실행 위치와 상관없이 DEFAULT_SAVE_DIR 아래에 저장하고,
+    # DB/응답에는 /temp_uploads 마운트로 바로 열 수 있는 상대 URL을 남김
+    file_path = os.path.join(DEFAULT_SAVE_DIR, filename)
+    image_path = f"temp_uploads/{filename}"
 
     # -------------------------------------------------------
     # [Step 3] AI 피부 분석 (GPT Vision API)
     # -------------------------------------------------------
     logger.info(f"🤖 GPT 분석 요청 시작: {file_path}")
 
-    gpt_result = analyze_skin_image(file_path)
+    gpt_result, saved = await asyncio.gather(
+        run_in_threadpool(analyze_skin_image, image_bytes),
+        run_in_threadpool(save_image_bytes, image_bytes, file_path),
+        return_exceptions=True
+    )
+    if isinstance(saved, Exception):
+        raise HTTPException(status_code=500, detail="이미지 파일 저장 실패")
+    if isinstance(gpt_result, Exception):
+        raise gpt_result
 
     if not gpt_result:
         raise HTTPException(status_code=502, detail="AI 분석 서버 응답 없음")
@@ -255,9 +356,14 @@ async def process_skin_analysis(
     total_score = max(0, 100 - int(negative_sum / 5))
 
     # DB 저장
-    new_id = save_analysis_log_db(user_id, file_path, scores, total_score)
+    new_id = await run_in_threadpool(save_analysis_log_db, user_id, image_path, scores, total_score)
 
     if not new_id:
+        # 기록이 남지 않았으므로 히스토리용으로 저장한 이미지도 지움
+        try:
+            os.remove(file_path)
+        except OSError as e:
+            logger.warning(f"이미지 삭제 실패: {e}")
         raise HTTPException(status_code=500, detail="데이터베이스 저장 실패")
 
     return {
@@ -266,5 +372,5 @@ async def process_skin_analysis(
         "source": f"{sensor_source} + Camera + GPT",
         "total_score": total_score,
         "scores": scores,
-        "image_path": file_path
+        "image_path": image_path
     }
\ No newline at end of file
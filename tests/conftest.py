@@ -0,0 +1,10 @@
+# conftest.py
+"""
+테스트 공통 설정
+저장소 루트(main.py가 있는 폴더)를 import 경로에 추가해 core/, services/ 모듈을 바로 불러옵니다.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
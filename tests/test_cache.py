@@ -0,0 +1,75 @@
+# test_cache.py
+"""[TTLCache 테스트] 만료(TTL)와 최대 개수 초과 시 LRU 삭제를 확인합니다."""
+
+import core.cache as cache_module
+from core.cache import TTLCache
+
+
+class FakeClock:
+    """time.monotonic 대신 쓰는 수동 시계"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _with_clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    return clock
+
+
+def test_get_before_and_after_ttl(monkeypatch):
+    clock = _with_clock(monkeypatch)
+    cache = TTLCache(ttl=10, maxsize=4)
+    cache.set("a", 1)
+
+    clock.now += 9.9
+    assert cache.get("a") == 1
+
+    clock.now += 0.1
+    assert cache.get("a") is None
+    assert cache.get("a", "default") == "default"
+
+
+def test_set_refreshes_ttl(monkeypatch):
+    clock = _with_clock(monkeypatch)
+    cache = TTLCache(ttl=10, maxsize=4)
+    cache.set("a", 1)
+
+    clock.now += 8
+    cache.set("a", 2)
+    clock.now += 8
+    assert cache.get("a") == 2
+
+
+def test_lru_eviction_keeps_recently_used(monkeypatch):
+    _with_clock(monkeypatch)
+    cache = TTLCache(ttl=10, maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    # a를 조회하면 가장 최근 사용이 되므로 다음 추가 때 b가 지워짐
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_delete_and_clear(monkeypatch):
+    _with_clock(monkeypatch)
+    cache = TTLCache(ttl=10, maxsize=4)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    cache.delete("a")
+    cache.delete("missing")
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+    cache.clear()
+    assert cache.get("b") is None
@@ -0,0 +1,67 @@
+# test_copy_rows.py
+"""[COPY 적재 테스트] copy_rows가 만드는 COPY 텍스트와 더미 데이터 생성의 COPY 경로를 확인합니다. (DB 불필요)"""
+
+import generated_skin_data
+from core.utils import copy_rows
+
+
+class FakeCursor:
+    """copy_expert로 넘어온 SQL과 버퍼 내용을 기록하는 가짜 커서"""
+
+    def __init__(self):
+        self.copies = []
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchone(self):
+        return (None,)  # SELECT MAX(id) -> 빈 테이블
+
+    def copy_expert(self, sql, buf):
+        self.copies.append((sql, buf.read()))
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_copy_rows_escapes_and_writes_null():
+    cur = FakeCursor()
+    copy_rows(cur, "t", ("a", "b", "c"), [
+        (1, "tab\there", None),
+        (2.5, "line\nbreak\r", "back\\slash"),
+    ])
+
+    sql, text = cur.copies[0]
+    assert sql == "COPY t (a, b, c) FROM STDIN WITH (FORMAT text)"
+    assert text == "1\ttab\\there\t\\N\n2.5\tline\\nbreak\\r\tback\\\\slash\n"
+
+
+def test_generated_data_uses_copy_for_large_batches(monkeypatch):
+    cur = FakeCursor()
+    monkeypatch.setattr(generated_skin_data.psycopg2, "connect", lambda **kw: FakeConnection(cur))
+    monkeypatch.setattr(generated_skin_data, "ROW_COUNT", 5)
+    monkeypatch.setattr(generated_skin_data, "COPY_MIN_ROWS", 5)
+
+    generated_skin_data.generate_and_insert()
+
+    assert len(cur.copies) == 1
+    sql, text = cur.copies[0]
+    assert sql.startswith(f"COPY {generated_skin_data.TABLE_NAME} (id, user_id, ")
+    lines = text.splitlines()
+    assert len(lines) == 5
+    assert all(len(line.split("\t")) == len(generated_skin_data.COLUMNS) for line in lines)
+    assert [line.split("\t")[0] for line in lines] == ["1", "2", "3", "4", "5"]
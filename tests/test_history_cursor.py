@@ -0,0 +1,45 @@
+# test_history_cursor.py
+"""[히스토리 커서 테스트] next_cursor 인코딩/디코딩과 잘못된 커서 거부를 확인합니다. (DB 불필요)"""
+
+import base64
+from datetime import datetime
+
+import pytest
+
+from core.utils import _decode_history_cursor, _encode_history_cursor, search_skin_history_db
+
+
+@pytest.mark.parametrize("created_at,row_id", [
+    (datetime(2025, 1, 2, 3, 4, 5, 678901), 42),
+    (datetime(2025, 12, 31, 23, 59, 59), 1),
+    (datetime(2024, 2, 29, 0, 0, 0), 987654321),
+])
+def test_round_trip(created_at, row_id):
+    cursor = _encode_history_cursor(created_at, row_id)
+
+    assert isinstance(cursor, str)
+    assert _decode_history_cursor(cursor) == (created_at, row_id)
+
+
+def test_cursor_is_url_safe():
+    cursor = _encode_history_cursor(datetime(2025, 1, 2, 3, 4, 5, 678901), 42)
+    assert all(ch.isalnum() or ch in "-_=" for ch in cursor)
+
+
+@pytest.mark.parametrize("cursor", [
+    "garbage!!",                                               # base64 아님
+    "한글커서",                                                  # ASCII 아님
+    base64.urlsafe_b64encode(b"hello").decode(),               # 구분자 없음
+    base64.urlsafe_b64encode(b"not-a-date|42").decode(),       # 날짜 형식 오류
+    base64.urlsafe_b64encode(b"2025-01-02T03:04:05|x").decode(),  # id가 숫자가 아님
+    base64.urlsafe_b64encode(b"2025-01-02|1|2").decode(),      # 필드 개수 오류
+])
+def test_rejects_malformed_cursor(cursor):
+    with pytest.raises(ValueError):
+        _decode_history_cursor(cursor)
+
+
+def test_search_raises_before_querying_db():
+    """잘못된 커서는 빈 결과가 아니라 ValueError로 알려야 합니다. (API에서 400으로 응답)"""
+    with pytest.raises(ValueError):
+        search_skin_history_db("anyone", cursor="garbage!!")
@@ -0,0 +1,41 @@
+# test_predictor.py
+"""[트러블 예측 모델 테스트] 미리 합친 가중치로 계산한 확률이 sklearn predict_proba와 같은지 확인합니다."""
+
+import numpy as np
+import pytest
+
+from core.utils import _compile_predictor, _lazy_sklearn
+
+
+@pytest.fixture(scope="module")
+def training_data():
+    rng = np.random.default_rng(11)
+    X = rng.normal(50, 20, size=(200, 12))
+    y = (X[:, 0] + rng.normal(0, 10, 200) > 55).astype(int)
+    return X, y
+
+
+def test_compiled_pipeline_matches_predict_proba(training_data):
+    LogisticRegression, Pipeline, StandardScaler = _lazy_sklearn()
+    X, y = training_data
+    model = Pipeline([
+        ("scaler", StandardScaler()),
+        ("clf", LogisticRegression(max_iter=1000, class_weight="balanced", C=0.5))
+    ]).fit(X, y)
+
+    predict = _compile_predictor(model)
+    for row in X[:50]:
+        features = row.reshape(1, -1)
+        assert predict(features) == pytest.approx(model.predict_proba(features)[0, 1], abs=1e-12)
+
+
+def test_other_models_fall_back_to_predict_proba(training_data):
+    from sklearn.tree import DecisionTreeClassifier
+
+    X, y = training_data
+    model = DecisionTreeClassifier(max_depth=3, random_state=0).fit(X, y)
+
+    predict = _compile_predictor(model)
+    for row in X[:20]:
+        features = row.reshape(1, -1)
+        assert predict(features) == model.predict_proba(features)[0, 1]
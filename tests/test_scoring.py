@@ -0,0 +1,88 @@
+# test_scoring.py
+"""
+[제품 채점 회귀 테스트]
+data/scoring_baseline.json은 채점 로직을 NumPy/numba로 바꾸기 전 코드로 만든 입력과 결과입니다.
+같은 입력에 대해 지금 코드가 같은 피부 나이와 top3(제품명, 점수)를 내는지 확인합니다.
+"""
+
+import json
+import os
+
+import pytest
+
+import services.skin_advisor_logic as logic
+from services.skin_advisor_logic import ProductMatrix, SkinCareAdvisor
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "data", "scoring_baseline.json")
+
+with open(BASELINE_PATH, encoding="utf-8") as f:
+    BASELINE = json.load(f)
+
+CASES = [
+    (g, c)
+    for g, group in enumerate(BASELINE["groups"])
+    for c in range(len(group["cases"]))
+]
+
+
+def _recommend(products, payload):
+    """[내부 함수] 입력 원본이 바뀌지 않도록 복사본으로 추천을 실행합니다."""
+    adv = SkinCareAdvisor(json.loads(json.dumps(payload)))
+    rec = adv.recommend_products(json.loads(json.dumps(products)))
+    return adv, rec
+
+
+@pytest.mark.parametrize("g,c", CASES)
+def test_matches_baseline(g, c):
+    group = BASELINE["groups"][g]
+    case = group["cases"][c]
+
+    adv, rec = _recommend(group["products"], case["payload"])
+
+    assert adv.calc_skin_age() == case["skin_age"]
+    assert [[p["name"], p["score"]] for p in rec["top3"]] == case["top3"]
+
+
+@pytest.mark.parametrize("g,c", CASES)
+def test_numpy_path_matches_baseline(monkeypatch, g, c):
+    """numba가 없는 환경(NumPy 계산)에서도 같은 결과가 나와야 합니다."""
+    monkeypatch.setattr(logic, "_NUMBA_AVAILABLE", False)
+    group = BASELINE["groups"][g]
+    case = group["cases"][c]
+
+    _, rec = _recommend(group["products"], case["payload"])
+
+    assert [[p["name"], p["score"]] for p in rec["top3"]] == case["top3"]
+
+
+def test_null_columns_do_not_break_scoring():
+    """DB에서 카테고리/태그/성분이 NULL(None)로 와도 추천이 끝까지 동작해야 합니다."""
+    group = BASELINE["groups"][1]
+    products = json.loads(json.dumps(group["products"]))
+    products.append({
+        "name": "null-row", "price": 1, "brand": "b", "official_category": None,
+        "tags": None, "featured_ingredients": None, "url": "u", "image_url": "i"
+    })
+
+    pm = ProductMatrix(products)
+    assert pm.cat_codes[-1] == pm.cat_idx[""]
+    assert not pm.tags_matrix[-1].any()
+
+    adv = SkinCareAdvisor(json.loads(json.dumps(group["cases"][0]["payload"])))
+    rec = adv.recommend_products(products)
+    adv.generate_routine_text(rec["top3"])
+    assert len(rec["top3"]) == 3
+
+
+def test_null_tags_on_top3_products():
+    """top3에 뽑힌 제품의 태그가 NULL(None)이어도 결과 포맷이 빈 태그 목록으로 나와야 합니다."""
+    group = BASELINE["groups"][1]
+    products = json.loads(json.dumps(group["products"]))
+    for p in products:
+        p["tags"] = None
+
+    adv = SkinCareAdvisor(json.loads(json.dumps(group["cases"][0]["payload"])))
+    rec = adv.recommend_products(products)
+    adv.generate_routine_text(rec["top3"])
+    assert len(rec["top3"]) == 3
+    assert all(item["tags"] == [] for item in rec["top3"])
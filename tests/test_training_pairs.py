@@ -0,0 +1,41 @@
+# test_training_pairs.py
+"""[학습 데이터 테스트] _build_training_pairs가 사용자별 행 루프(기존 방식)로 만든 학습 쌍과 같은지 확인합니다."""
+
+import numpy as np
+
+from core.utils import _build_training_pairs
+
+
+def _reference_pairs(user_ids, data, horizon=2):
+    """[내부 함수] 사용자별로 한 행씩 비교하던 기존 방식의 학습 쌍 생성"""
+    X, y = [], []
+    start = 0
+    for i in range(1, len(user_ids) + 1):
+        if i == len(user_ids) or user_ids[i] != user_ids[start]:
+            seg = data[start:i]
+            for j in range(len(seg) - horizon):
+                red_now, red_fut = seg[j, 0], seg[j + horizon, 0]
+                X.append(seg[j])
+                y.append(1 if (red_fut >= 60 and (red_fut - red_now) >= 8) else 0)
+            start = i
+    return np.array(X).reshape(-1, data.shape[1]), np.array(y, dtype=np.int64)
+
+
+def test_training_pairs_match_row_loop():
+    rng = np.random.default_rng(7)
+    # 기록 수가 horizon 이하인 사용자(b, d)는 학습 쌍이 없어야 함
+    user_ids = ["a"] * 9 + ["b"] * 2 + ["c"] * 15 + ["d"] + ["e"] * 3
+    data = rng.integers(0, 101, size=(len(user_ids), 12)).astype(np.float64)
+
+    X, y = _build_training_pairs(user_ids, data)
+    X_ref, y_ref = _reference_pairs(user_ids, data)
+
+    np.testing.assert_array_equal(X, X_ref)
+    np.testing.assert_array_equal(y, y_ref)
+    assert y.sum() > 0
+
+
+def test_training_pairs_empty():
+    X, y = _build_training_pairs(["a", "a"], np.zeros((2, 12)))
+    assert X.shape == (0, 12)
+    assert y.shape == (0,)